@@ -0,0 +1,134 @@
+"""Measure EventBus dispatch throughput before and after compiled dispatch tables,
+and the cost of allocating events every tick with and without the event pool.
+
+Usage: python -m benchmarks.bench_events [num_events] [num_event_types]
+"""
+
+from collections import deque
+from dataclasses import dataclass
+import gc
+import math
+import sys
+import time
+
+from seed.common.events import Event, EventBus, FleetArrivedAtSystemEvent
+
+
+class LegacyEventBus:
+    """EventBus as it was before dispatch tables: listeners are re-sorted on every
+    subscribe and looked up per event.
+    """
+
+    def __init__(self):
+        self._listeners = {}
+        self._queue = deque()
+
+    def subscribe(self, event_type, callback, priority: int = 0) -> None:
+        self._listeners.setdefault(event_type, []).append((priority, callback))
+        self._listeners[event_type].sort(key=lambda x: x[0])
+
+    def publish(self, event: Event) -> None:
+        self._queue.append(event)
+
+    def dispatch(self) -> None:
+        while self._queue:
+            event = self._queue.popleft()
+            for _, callback in self._listeners.get(type(event), []):
+                callback(event)
+
+
+@dataclass
+class BenchEvent(Event):
+    value: int
+
+
+def make_event_types(num_event_types: int) -> list[type[Event]]:
+    return [
+        type(f"BenchEvent{i}", (BenchEvent,), {}) for i in range(num_event_types)
+    ]
+
+
+def run(
+    bus, event_types, num_events: int, handlers_per_type: int, repeat: int = 3
+) -> float:
+    """Return the best events dispatched per second over repeat runs."""
+    received = [0]
+
+    def handler(event) -> None:
+        received[0] += 1
+
+    for event_type in event_types:
+        for priority in range(handlers_per_type):
+            bus.subscribe(event_type, handler, priority)
+
+    if isinstance(bus, EventBus):
+        bus.freeze()
+
+    events = [event_types[i % len(event_types)](i) for i in range(num_events)]
+
+    best = math.inf
+    for _ in range(repeat):
+        for event in events:
+            bus.publish(event)
+
+        # Only time dispatch, without collections triggered by the events above
+        gc.disable()
+        start = time.perf_counter()
+        bus.dispatch()
+        best = min(best, time.perf_counter() - start)
+        gc.enable()
+
+    assert received[0] == repeat * num_events * handlers_per_type
+    return num_events / best
+
+
+def run_ticks(bus: EventBus, num_ticks: int, events_per_tick: int) -> tuple[float, int]:
+    """Publish and dispatch events_per_tick fresh events every tick. Returns the
+    time taken and the number of garbage collections it triggered.
+    """
+    arrivals = []
+    bus.subscribe(FleetArrivedAtSystemEvent, lambda e: arrivals.append(e.fleet))
+
+    collections = sum(stats["collections"] for stats in gc.get_stats())
+    start = time.perf_counter()
+    for tick in range(num_ticks):
+        for fleet in range(events_per_tick):
+            bus.publish(bus.acquire(FleetArrivedAtSystemEvent, fleet, tick))
+        bus.dispatch()
+        arrivals.clear()
+
+    elapsed = time.perf_counter() - start
+    return elapsed, sum(stats["collections"] for stats in gc.get_stats()) - collections
+
+
+def main(num_events: int = 300_000, num_event_types: int = 8) -> None:
+    event_types = make_event_types(num_event_types)
+    print(f"{num_events} events over {num_event_types} types")
+
+    for handlers_per_type in (1, 3):
+        args = (event_types, num_events, handlers_per_type)
+        legacy = run(LegacyEventBus(), *args)
+        compiled = run(EventBus(), *args)
+        fan_out = run(EventBus(fan_out=True), *args)
+
+        print(f"{handlers_per_type} handler(s) per type:")
+        for name, rate in (
+            ("legacy", legacy),
+            ("compiled", compiled),
+            ("compiled fan-out", fan_out),
+        ):
+            print(f"  {name + ':':17} {rate:12,.0f} events/s ({rate / legacy:.2f}x)")
+
+    num_ticks = 200
+    events_per_tick = max(num_events // num_ticks, 1)
+    print(f"{num_ticks} ticks of {events_per_tick} fresh events:")
+    for name, bus in (
+        ("unpooled", EventBus()),
+        ("pooled", EventBus(pool_size=events_per_tick)),
+    ):
+        elapsed, collections = run_ticks(bus, num_ticks, events_per_tick)
+        print(f"  {name + ':':9} {elapsed:6.2f}s, {collections} garbage collections")
+
+
+if __name__ == "__main__":
+    main(*(int(arg) for arg in sys.argv[1:]))
@@ -0,0 +1,109 @@
+"""Compare flat A* with hierarchical routing on a large galaxy.
+
+Every configuration with a bound against the optimal path (portal spacing 0, or
+a max stretch) is checked against it.
+
+Usage: python -m benchmarks.bench_routing [num_systems] [num_queries]
+"""
+
+import math
+import random
+import sys
+import time
+
+import numpy as np
+
+from seed.common.galaxy import generate_galaxy
+from seed.common.spatial import SpatialGrid
+from seed.common.graph import CSRGraph, astar
+from seed.common.hierarchical import HierarchicalRouter
+
+
+SHIP_RANGE = 8
+
+# (cluster size, portal spacing, epsilon, max stretch), sizes in ship ranges
+CONFIGS = [
+    (8, 0, 0.0, None),
+    (8, 1, 0.0, None),
+    (16, 1, 0.0, None),
+    (8, 1, 0.5, None),
+    (8, 1, 0.0, 1.5),
+    (8, 1, 0.0, 1.2),
+    (8, 1, 0.0, 1.1),
+]
+
+
+def spiral_positions(num_systems: int, seed: int = 0) -> list[tuple[float, float]]:
+    # Scale the radius so the density of the default 200 system galaxy is kept
+    radius = 30 * math.sqrt(num_systems / 200)
+    rng = np.random.default_rng(seed)
+    return [tuple(p) for p in generate_galaxy(num_systems, radius=radius, rng=rng)]
+
+
+def path_length(positions, path) -> float:
+    return sum(math.dist(positions[a], positions[b]) for a, b in zip(path, path[1:]))
+
+
+def main(num_systems: int = 20000, num_queries: int = 50) -> None:
+    positions = spiral_positions(num_systems)
+
+    start = time.perf_counter()
+    graph = CSRGraph.within_range(SpatialGrid(positions, SHIP_RANGE), SHIP_RANGE)
+    print(
+        f"{num_systems} systems, {graph.num_edges} edges, "
+        f"graph built in {time.perf_counter() - start:.2f}s"
+    )
+
+    rng = random.Random(1)
+    queries = [
+        (rng.randrange(num_systems), rng.randrange(num_systems))
+        for _ in range(num_queries)
+    ]
+
+    start = time.perf_counter()
+    flat = [astar(graph, positions, s, t) for s, t in queries]
+    flat_time = time.perf_counter() - start
+    print(f"flat A*: {1000 * flat_time / num_queries:8.2f} ms/query")
+
+    for cluster_ranges, spacing, epsilon, max_stretch in CONFIGS:
+        start = time.perf_counter()
+        router = HierarchicalRouter(
+            graph,
+            positions,
+            cluster_ranges * SHIP_RANGE,
+            spacing * SHIP_RANGE,
+            epsilon,
+            max_stretch,
+        )
+        build_time = time.perf_counter() - start
+
+        start = time.perf_counter()
+        paths = [router.find_path(s, t) for s, t in queries]
+        query_time = time.perf_counter() - start
+
+        ratios = [
+            path_length(positions, h) / path_length(positions, f)
+            for f, h in zip(flat, paths)
+            if len(f) > 1
+        ]
+        worst = max(ratios, default=1.0)
+
+        # The guaranteed worst ratio against the optimal path, if any
+        bound = max_stretch
+        if spacing == 0:
+            bound = min(1 + epsilon, bound or math.inf)
+        if bound is not None:
+            assert worst <= bound + 1e-9, f"path ratio {worst} is over {bound}"
+
+        print(
+            f"hierarchical c={cluster_ranges} s={spacing} e={epsilon} "
+            f"m={max_stretch}: "
+            f"{1000 * query_time / num_queries:8.2f} ms/query, "
+            f"built in {build_time:.2f}s, {router.num_portals} portals, "
+            f"worst path ratio {worst:.4f} (bound {bound or 'none'}), "
+            f"{router.fallbacks} flat fallbacks"
+        )
+
+
+if __name__ == "__main__":
+    main(*(int(arg) for arg in sys.argv[1:]))
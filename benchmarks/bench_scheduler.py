@@ -0,0 +1,84 @@
+"""Compare the EventBus timing wheel with a binary heap for scheduled events.
+
+Fleet arrivals are scheduled a short, bounded number of ticks ahead, with the odd
+event far in the future. Every tick schedules a batch of events and drains the
+ones that are due.
+
+Usage: python -m benchmarks.bench_scheduler [num_ticks] [events_per_tick]
+"""
+
+from heapq import heappush, heappop
+from itertools import count
+import random
+import sys
+import time
+
+from seed.common.timer_wheel import TimerWheel
+
+
+class HeapScheduler:
+    """The heap EventBus.schedule used to push onto, with a sequence number to
+    break ties since events aren't orderable.
+    """
+
+    def __init__(self):
+        self.current_tick = 0
+        self._heap = []
+        self._order = count()
+
+    def schedule(self, tick: int, item) -> None:
+        heappush(self._heap, (tick, next(self._order), item))
+
+    def advance(self) -> list:
+        self.current_tick += 1
+        due = []
+        heap = self._heap
+        while heap and heap[0][0] <= self.current_tick:
+            due.append(heappop(heap)[2])
+
+        return due
+
+
+def make_delays(num_ticks: int, events_per_tick: int, seed: int = 0) -> list[list[int]]:
+    rng = random.Random(seed)
+    return [
+        [
+            rng.randrange(1, 64) if rng.random() < 0.99 else rng.randrange(64, 100_000)
+            for _ in range(events_per_tick)
+        ]
+        for _ in range(num_ticks)
+    ]
+
+
+def run(scheduler, delays: list[list[int]]) -> tuple[float, int]:
+    """Return the time taken and the number of events drained."""
+    drained = 0
+    start = time.perf_counter()
+    for tick_delays in delays:
+        now = scheduler.current_tick
+        for delay in tick_delays:
+            scheduler.schedule(now + delay, delay)
+
+        drained += len(scheduler.advance())
+
+    return time.perf_counter() - start, drained
+
+
+def main(num_ticks: int = 2000, events_per_tick: int = 500) -> None:
+    delays = make_delays(num_ticks, events_per_tick)
+    num_events = num_ticks * events_per_tick
+    print(f"{num_ticks} ticks, {events_per_tick} events scheduled per tick")
+
+    heap_time, heap_drained = run(HeapScheduler(), delays)
+    wheel_time, wheel_drained = run(TimerWheel(), delays)
+    assert heap_drained == wheel_drained
+
+    for name, elapsed in (("heap", heap_time), ("timing wheel", wheel_time)):
+        print(
+            f"{name:>12}: {elapsed:6.2f}s, "
+            f"{num_events / elapsed:12,.0f} events/s ({heap_time / elapsed:.2f}x)"
+        )
+
+
+if __name__ == "__main__":
+    main(*(int(arg) for arg in sys.argv[1:]))
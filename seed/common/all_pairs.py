@@ -0,0 +1,173 @@
+"""Precomputed all-pairs shortest path tables for small and medium galaxies.
+
+For a few thousand systems it is cheap enough to run Dijkstra from every system
+once and keep the results: an N x N distance matrix and an N x N next-hop table.
+A route lookup then just follows next hops, which costs O(path length).
+"""
+
+import os
+import hashlib
+import math
+from concurrent.futures import ProcessPoolExecutor
+from heapq import heappush, heappop
+
+import numpy as np
+
+from seed.common.graph import CSRGraph
+
+
+def graph_fingerprint(graph: CSRGraph) -> str:
+    """Return a digest of a graph's structure, used to validate saved tables."""
+    digest = hashlib.sha1()
+    for array in (graph.offsets, graph.neighbors, graph.weights):
+        digest.update(np.ascontiguousarray(array).tobytes())
+
+    return digest.hexdigest()
+
+
+def _shortest_path_rows(
+    offsets: list[int], neighbors: list[int], weights: list[float], sources: list[int]
+) -> tuple[np.ndarray, np.ndarray]:
+    """Run Dijkstra from every source and return its rows of the distance and
+    next-hop tables.
+    """
+    n = len(offsets) - 1
+    dist_rows = np.empty((len(sources), n), dtype=np.float32)
+    hop_rows = np.empty((len(sources), n), dtype=np.int32)
+
+    for row, source in enumerate(sources):
+        dist = [math.inf] * n
+        first_hop = [-1] * n
+        dist[source] = 0.0
+        first_hop[source] = source
+
+        heap = [(0.0, source)]
+        while heap:
+            current_dist, current = heappop(heap)
+            if current_dist > dist[current]:
+                continue
+
+            # The first hop towards anything we reach through current is the first
+            # hop towards current, unless current is the source itself.
+            hop = first_hop[current]
+            for k in range(offsets[current], offsets[current + 1]):
+                neighbor = neighbors[k]
+                weight = current_dist + weights[k]
+                if weight < dist[neighbor]:
+                    dist[neighbor] = weight
+                    first_hop[neighbor] = neighbor if current == source else hop
+                    heappush(heap, (weight, neighbor))
+
+        dist_rows[row] = dist
+        hop_rows[row] = first_hop
+
+    return dist_rows, hop_rows
+
+
+# Graph shared with worker processes, set once per worker by _init_worker so that it
+# isn't pickled again for every chunk of sources.
+_worker_graph = None
+
+
+def _init_worker(offsets: list[int], neighbors: list[int], weights: list[float]):
+    global _worker_graph
+    _worker_graph = (offsets, neighbors, weights)
+
+
+def _worker_rows(sources: list[int]) -> tuple[np.ndarray, np.ndarray]:
+    return _shortest_path_rows(*_worker_graph, sources)
+
+
+class AllPairsTable:
+    """Distance and next-hop tables for every pair of nodes in a graph.
+
+    ``dist[s, t]`` is the length of the shortest path from s to t (inf if there is
+    none) and ``next_hop[s, t]`` is the node after s on that path (-1 if there is
+    none, s itself if s == t).
+    """
+
+    def __init__(self, dist: np.ndarray, next_hop: np.ndarray, fingerprint: str):
+        self.dist = dist
+        self.next_hop = next_hop
+        self.fingerprint = fingerprint
+
+    def __len__(self) -> int:
+        return len(self.dist)
+
+    @classmethod
+    def build(cls, graph: CSRGraph, workers: int = 0) -> "AllPairsTable":
+        """Compute the tables for graph, splitting the sources across a process
+        pool if workers > 1.
+        """
+        n = len(graph)
+        args = (graph.offsets_list, graph.neighbors_list, graph.weights_list)
+        if workers <= 1 or n < 2 * workers:
+            dist, next_hop = _shortest_path_rows(*args, list(range(n)))
+            return cls(dist, next_hop, graph_fingerprint(graph))
+
+        # A few chunks per worker keeps the pool busy when some sources are slower
+        chunk_size = math.ceil(n / (4 * workers))
+        chunks = [
+            list(range(i, min(i + chunk_size, n))) for i in range(0, n, chunk_size)
+        ]
+
+        with ProcessPoolExecutor(
+            workers, initializer=_init_worker, initargs=args
+        ) as pool:
+            rows = list(pool.map(_worker_rows, chunks))
+
+        dist = np.concatenate([d for d, _ in rows])
+        next_hop = np.concatenate([h for _, h in rows])
+        return cls(dist, next_hop, graph_fingerprint(graph))
+
+    def path(self, source: int, target: int) -> list[int]:
+        """Return the shortest path from source to target as a list of nodes, or an
+        empty list if target can't be reached.
+        """
+        next_hop = self.next_hop
+        if next_hop[source, target] < 0:
+            return []
+
+        path = [source]
+        current = source
+        while current != target:
+            current = int(next_hop[current, target])
+            path.append(current)
+
+        return path
+
+    def save(self, path: str) -> None:
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with open(path, "wb") as f:
+            np.savez(
+                f,
+                dist=self.dist,
+                next_hop=self.next_hop,
+                fingerprint=np.array(self.fingerprint),
+            )
+
+    @classmethod
+    def load(cls, path: str, graph: CSRGraph) -> "AllPairsTable | None":
+        """Load tables saved by save(). Returns None if there is no file or it was
+        computed for a different graph.
+        """
+        if not os.path.exists(path):
+            return None
+
+        with np.load(path) as data:
+            if str(data["fingerprint"]) != graph_fingerprint(graph):
+                return None
+
+            return cls(data["dist"], data["next_hop"], str(data["fingerprint"]))
+
+    @classmethod
+    def load_or_build(
+        cls, path: str | None, graph: CSRGraph, workers: int = 0
+    ) -> "AllPairsTable":
+        table = cls.load(path, graph) if path else None
+        if table is None:
+            table = cls.build(graph, workers)
+            if path:
+                table.save(path)
+
+        return table
@@ -29,6 +29,193 @@ characters?
 """
 
 
+# Entities are plain ints that pack a dense slot index into the low bits and a
+# generation into the high bits. When an entity is destroyed its slot is recycled
+# with a bumped generation, so stale handles to the old entity can be detected by
+# comparing generations. Generations start at 1, so no entity is ever 0 and
+# NULL_ENTITY can stand in for "no entity" in array-backed storage.
+Entity = int
+
+NULL_ENTITY = 0
+ENTITY_INDEX_BITS = 32
+ENTITY_INDEX_MASK = (1 << ENTITY_INDEX_BITS) - 1
+
+# Keep packed entities within a signed 64-bit integer
+MAX_GENERATION = (1 << 31) - 1
+
+
+def make_entity(index: int, generation: int) -> Entity:
+    return (generation << ENTITY_INDEX_BITS) | index
+
+
+def entity_index(entity: Entity) -> int:
+    return entity & ENTITY_INDEX_MASK
+
+
+def entity_generation(entity: Entity) -> int:
+    return entity >> ENTITY_INDEX_BITS
+
+
+class EntityAllocator:
+    """Hands out entity IDs and recycles the slots of destroyed entities."""
+
+    def __init__(self):
+        # Slot index -> generation of the entity currently (or next) using it
+        self._generations: list[int] = []
+
+        # Slots are reused first-in first-out, so a single slot's generation
+        # doesn't churn when entities are created and destroyed every tick.
+        self._free: deque[int] = deque()
+
+    def __len__(self) -> int:
+        """Return the number of live entities."""
+        return len(self._generations) - len(self._free)
+
+    @property
+    def capacity(self) -> int:
+        """Return the number of slots, i.e. one past the largest entity index."""
+        return len(self._generations)
+
+    def create(self) -> Entity:
+        if self._free:
+            index = self._free.popleft()
+            return make_entity(index, self._generations[index])
+
+        self._generations.append(1)
+        return make_entity(len(self._generations) - 1, 1)
+
+    def destroy(self, entity: Entity) -> None:
+        if not self.is_alive(entity):
+            raise KeyError(entity)
+
+        index = entity & ENTITY_INDEX_MASK
+        generation = self._generations[index] + 1
+        self._generations[index] = generation if generation <= MAX_GENERATION else 1
+        self._free.append(index)
+
+    def is_alive(self, entity: Entity) -> bool:
+        index = entity & ENTITY_INDEX_MASK
+        return (
+            index < len(self._generations)
+            and self._generations[index] == entity >> ENTITY_INDEX_BITS
+        )
+
+
+class Component:
+    """Base class for all components stored in a WorldState.
+
+    Fields are plain attributes. Assignments to a field are only reported to the
+    WorldState once something needs them (a field index, or a change query for
+    the type), at which point track_field installs a TrackedField for it.
+    """
+
+    # Set by the WorldState a component is stored in, so that assignments to its
+    # tracked fields can be reported back.
+    _world = None
+    _entity: Entity = NULL_ENTITY
+
+    # Names of the fields assignments are reported for
+    _tracked_fields: frozenset[str] = frozenset()
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+
+        # The type the component is stored under. Subclasses that stand in for
+        # another component type (e.g. columnar views) set this themselves.
+        if "_component_type" not in cls.__dict__:
+            cls._component_type = cls
+
+
+class TrackedField:
+    """Descriptor for a component field whose assignments are routed through the
+    component's WorldState (see WorldState.set_component_field). Wraps the
+    property a columnar view defines for the field, if any.
+    """
+
+    __slots__ = ("name", "inner")
+
+    def __init__(self, name: str, inner: property | None = None):
+        self.name = name
+        self.inner = inner
+
+    def __get__(self, obj, owner=None):
+        if obj is None:
+            return self
+        if self.inner is not None:
+            return self.inner.__get__(obj, owner)
+
+        try:
+            return obj.__dict__[self.name]
+        except KeyError:
+            raise AttributeError(self.name) from None
+
+    def __set__(self, obj, value) -> None:
+        world = obj._world
+        if world is None:
+            self.store(obj, value)
+        else:
+            world.set_component_field(obj, self.name, value)
+
+    def store(self, obj, value) -> None:
+        """Assign the field without reporting it."""
+        if self.inner is not None:
+            self.inner.__set__(obj, value)
+        else:
+            obj.__dict__[self.name] = value
+
+
+def track_field(component_type: type, name: str) -> None:
+    """Report assignments to a field of component_type, and of its subclasses
+    (e.g. columnar views), to the WorldState the component is stored in.
+    """
+    if isinstance(component_type.__dict__.get(name), TrackedField):
+        return
+
+    classes = [component_type]
+    for cls in classes:
+        classes.extend(cls.__subclasses__())
+
+        current = cls.__dict__.get(name)
+        if isinstance(current, TrackedField):
+            continue
+        if cls is component_type or isinstance(current, property):
+            inner = current if isinstance(current, property) else None
+            setattr(cls, name, TrackedField(name, inner))
+
+    component_type._tracked_fields = component_type._tracked_fields | {name}
+
+
+@dataclass
+class SystemComponent(Component):
+    position: tuple[float, float]
+    owning_civ: Entity | None = None
+
+    # Ships built per tick for each fleet parked here
+    infrastructure: int = 1
+
+
+@dataclass
+class CivilizationComponent(Component):
+    owned_systems: list[Entity] = field(default_factory=lambda: [])
+
+    # Cached list of systems this civ can reach. None means the cache is invalid.
+    reachable_systems: list[Entity] | None = None
+    ship_range: int = 8
+
+
+@dataclass
+class FleetComponent(Component):
+    owning_civ: Entity | None
+    size: int
+    parked_system: Entity | None
+
+
+@dataclass
+class HaloComponent(Component):
+    # Marks a read-only replica of a system owned by another shard
+    shard: int
+
+
 @dataclass(slots=True)
 class System:
     idx: int
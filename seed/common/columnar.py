@@ -0,0 +1,210 @@
+"""Struct-of-arrays storage for fixed-schema components.
+
+Instead of one heap object per component, every field of a component type is
+stored in its own NumPy column and each entity owns one dense row. Systems can
+grab a whole column (e.g. every fleet's size) and do vectorized math on it, while
+the rest of the code keeps talking to lightweight view objects that read and
+write through to the columns.
+"""
+
+import numpy as np
+
+from seed.common.base_types import (
+    Entity,
+    Component,
+    track_field,
+    NULL_ENTITY,
+    ENTITY_INDEX_MASK,
+    SystemComponent,
+    FleetComponent,
+)
+
+
+# Fields with this dtype hold an Entity | None. They are stored as int64 with
+# NULL_ENTITY standing in for None.
+ENTITY_DTYPE = "entity"
+
+# Component type -> {field name: (dtype, per-row shape)}
+COLUMN_SCHEMAS: dict[type, dict[str, tuple[str, tuple[int, ...]]]] = {
+    SystemComponent: {
+        "position": ("f8", (2,)),
+        "owning_civ": (ENTITY_DTYPE, ()),
+        "infrastructure": ("i8", ()),
+    },
+    FleetComponent: {
+        "owning_civ": (ENTITY_DTYPE, ()),
+        "size": ("i8", ()),
+        "parked_system": (ENTITY_DTYPE, ()),
+    },
+}
+
+
+def _make_property(name: str, dtype: str, shape: tuple[int, ...]) -> property:
+    # Convert back to plain Python values so that views behave like the dataclass
+    # they stand in for (tuples for positions, ints instead of np.int64, ...).
+    if shape:
+
+        def fget(self):
+            store = self._store
+            return tuple(store.columns[name][store.row(self._handle)].tolist())
+
+    elif dtype == ENTITY_DTYPE:
+
+        def fget(self):
+            store = self._store
+            return store.columns[name][store.row(self._handle)].item() or None
+
+    else:
+
+        def fget(self):
+            store = self._store
+            return store.columns[name][store.row(self._handle)].item()
+
+    if dtype == ENTITY_DTYPE:
+
+        def fset(self, value):
+            store = self._store
+            store.columns[name][store.row(self._handle)] = value or NULL_ENTITY
+
+    else:
+
+        def fset(self, value):
+            store = self._store
+            store.columns[name][store.row(self._handle)] = value
+
+    return property(fget, fset)
+
+
+def make_view_class(component_type: type, schema: dict) -> type:
+    """Create a view class for component_type whose fields live in a ColumnStore.
+
+    The view subclasses component_type, so isinstance checks, __eq__ and __repr__
+    keep working.
+    """
+    namespace = {
+        name: _make_property(name, dtype, shape)
+        for name, (dtype, shape) in schema.items()
+    }
+    namespace["_component_type"] = component_type
+    view_class = type(f"{component_type.__name__}View", (component_type,), namespace)
+
+    # Keep reporting assignments to the fields that are tracked already
+    for name in component_type._tracked_fields & namespace.keys():
+        track_field(view_class, name)
+
+    return view_class
+
+
+class ColumnStore:
+    """Columnar storage for every component of a single type."""
+
+    def __init__(self, component_type: type, schema: dict | None = None, capacity=64):
+        self.component_type = component_type
+        self.schema = schema or COLUMN_SCHEMAS[component_type]
+        self.view_class = make_view_class(component_type, self.schema)
+
+        self.columns: dict[str, np.ndarray] = {
+            name: np.empty(
+                (capacity, *shape), dtype="i8" if dtype == ENTITY_DTYPE else dtype
+            )
+            for name, (dtype, shape) in self.schema.items()
+        }
+
+        # Dense row -> entity
+        self._entities = np.empty(capacity, dtype="i8")
+        self._size = 0
+
+        # Entity index -> dense row, or -1. Indexed by entity index rather than by
+        # entity, so a whole array of entities can be mapped to rows at once.
+        self.rows = np.full(capacity, -1, dtype="i8")
+
+    def __len__(self) -> int:
+        return self._size
+
+    def __contains__(self, entity: Entity) -> bool:
+        try:
+            self.row(entity)
+        except KeyError:
+            return False
+
+        return True
+
+    @property
+    def entities(self) -> np.ndarray:
+        """Return the entity owning each row."""
+        return self._entities[: self._size]
+
+    def _grow(self) -> None:
+        for name, column in self.columns.items():
+            self.columns[name] = _resized(column, 2 * len(column))
+
+        self._entities = _resized(self._entities, 2 * len(self._entities))
+
+    def add(self, entity: Entity, component: Component) -> Component:
+        """Copy component's fields into a new row and return a view onto it."""
+        row = self._size
+        if row == len(self._entities):
+            self._grow()
+
+        for name, column in self.columns.items():
+            value = getattr(component, name)
+            column[row] = NULL_ENTITY if value is None else value
+
+        index = entity & ENTITY_INDEX_MASK
+        if index >= len(self.rows):
+            grown = np.full(max(2 * len(self.rows), index + 1), -1, dtype="i8")
+            grown[: len(self.rows)] = self.rows
+            self.rows = grown
+
+        self._entities[row] = entity
+        self.rows[index] = row
+        self._size += 1
+        return self.view(entity)
+
+    def remove(self, entity: Entity) -> None:
+        """Remove entity's row by moving the last row into its slot."""
+        index = entity & ENTITY_INDEX_MASK
+        row = self.rows[index]
+        last = self._size - 1
+        if row != last:
+            for column in self.columns.values():
+                column[row] = column[last]
+
+            moved = self._entities[last]
+            self._entities[row] = moved
+            self.rows[moved & ENTITY_INDEX_MASK] = row
+
+        self.rows[index] = -1
+        self._size -= 1
+
+    def row(self, entity: Entity) -> int:
+        """Return entity's row. Raises KeyError for stale handles."""
+        index = entity & ENTITY_INDEX_MASK
+        row = self.rows[index] if index < len(self.rows) else -1
+
+        # Rows store the full entity, so a view of a removed entity whose slot has
+        # been recycled fails this comparison on its generation bits.
+        if row < 0 or self._entities[row] != entity:
+            raise KeyError(entity)
+
+        return row
+
+    def view(self, entity: Entity) -> Component:
+        view = object.__new__(self.view_class)
+        view._store = self
+        view._handle = entity
+        return view
+
+    def column(self, name: str) -> np.ndarray:
+        """Return the live column for a field, one row per entity in self.entities.
+
+        The array is a view, so in-place updates (e.g. ``column("size")[:] += 1``)
+        write straight into the store. It is invalidated by add() and remove().
+        """
+        return self.columns[name][: self._size]
+
+
+def _resized(array: np.ndarray, length: int) -> np.ndarray:
+    grown = np.empty((length, *array.shape[1:]), dtype=array.dtype)
+    grown[: len(array)] = array
+    return grown
@@ -0,0 +1,73 @@
+from collections import OrderedDict
+
+import numpy as np
+
+
+class DistanceMatrix:
+    """Pairwise distances between a fixed set of 2D points, stored as float32.
+
+    Up to dense_max_points points the whole N x N matrix is computed up front,
+    block_size rows at a time so the float64 temporaries stay small. Beyond that,
+    rows are computed a block at a time the first time they are needed, and only
+    the max_blocks most recently used blocks are kept.
+    """
+
+    def __init__(
+        self,
+        positions,
+        dense_max_points: int = 4096,
+        block_size: int = 64,
+        max_blocks: int = 16,
+    ):
+        self.positions = np.asarray(positions, dtype=np.float64).reshape(-1, 2)
+        self.block_size = block_size
+        self.max_blocks = max_blocks
+
+        self.dense = len(self.positions) <= dense_max_points
+        self.matrix = None
+        if self.dense:
+            n = len(self.positions)
+            self.matrix = np.empty((n, n), dtype=np.float32)
+            for start in range(0, n, block_size):
+                stop = min(start + block_size, n)
+                self._rows(start, stop, out=self.matrix[start:stop])
+
+        # Block number -> rows [block * block_size, (block + 1) * block_size)
+        self._blocks: OrderedDict[int, np.ndarray] = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self.positions)
+
+    def _rows(self, start: int, stop: int, out: np.ndarray | None = None):
+        """Compute rows [start, stop) into out, or a new float32 array."""
+        x, y = self.positions[:, 0], self.positions[:, 1]
+        dx = x[start:stop, None] - x[None, :]
+        dy = y[start:stop, None] - y[None, :]
+        if out is None:
+            out = np.empty(dx.shape, dtype=np.float32)
+
+        return np.hypot(dx, dy, out=out, casting="same_kind")
+
+    def _block(self, block: int) -> np.ndarray:
+        rows = self._blocks.get(block)
+        if rows is None:
+            start = block * self.block_size
+            rows = self._rows(start, start + self.block_size)
+            self._blocks[block] = rows
+            if len(self._blocks) > self.max_blocks:
+                self._blocks.popitem(last=False)
+        else:
+            self._blocks.move_to_end(block)
+
+        return rows
+
+    def row(self, i: int) -> np.ndarray:
+        """Return the distances from point i to every point."""
+        if self.dense:
+            return self.matrix[i]
+
+        block, offset = divmod(i, self.block_size)
+        return self._block(block)[offset]
+
+    def distance(self, i: int, j: int) -> float:
+        return float(self.row(i)[j])
@@ -1,60 +1,260 @@
 from abc import ABC
 from collections import deque
+from contextlib import contextmanager
 from dataclasses import dataclass
 from seed.common.base_types import *
+from seed.common.timer_wheel import TimerWheel
 
-from heapq import heappush, heappop
+from itertools import chain, count
+import threading
 
 
-@dataclass
+@dataclass(slots=True)
 class Event(ABC):
     pass
 
 
 class EventBus:
-    def __init__(self):
-        # Event -> list[(priority, callable)]
+    """Queues events and delivers them to subscribers in priority order.
+
+    Callbacks are compiled into a flat tuple per event type the first time that
+    type is dispatched (or all at once by freeze()), so dispatching an event is a
+    single dict lookup and a loop over the tuple. With fan_out, an event is also
+    delivered to the subscribers of each of its base classes.
+
+    Batch subscribers get a list of every event of their type once the queue has
+    been drained, in priority order among themselves. Events they publish start
+    another round of the same dispatch.
+
+    With a pool_size, events that have been dispatched go back to a pool of up to
+    pool_size events per type, which acquire() hands out again instead of
+    allocating new ones. The bus then owns every event published to it, so
+    handlers must not keep references to events after dispatch() returns.
+
+    While buffering, each thread publishes into its own buffer instead of the
+    queue, and end_buffering() appends the buffers to the queue in a fixed order,
+    so the events systems publish from a thread pool are dispatched in the same
+    order as if the systems had run one after another.
+    """
+
+    def __init__(self, fan_out: bool = False, pool_size: int = 0):
+        # Event -> list[(priority, subscription order, callable)]
         self._listeners = {}
+        self._subscriptions = count()
+        self.fan_out = fan_out
+
+        # Event -> events collected for batch subscribers during this dispatch, and
+        # list[(priority, subscription order, event type, callable)]
+        self._batches: dict[type[Event], list[Event]] = {}
+        self._batch_listeners = []
+
+        # Event -> callbacks sorted by priority
+        self._dispatch_table: dict[type[Event], tuple[callable, ...]] = {}
+        self.frozen = False
+
+        # Event -> dispatched events ready to be reused
+        self.pool_size = pool_size
+        self._pool: dict[type[Event], list[Event]] = {}
+        self._pooled: set[int] = set()  # id() of every event in a pool
+        self._dispatched: list[Event] = []
+
         self._queue = deque()
-        self._scheduled_events = []
+        self._scheduled_events = TimerWheel()
+
+        self._buffering = False
+        self._thread_state = threading.local()
         self.current_tick = 0
 
+    # Buses can be copied (e.g. by Scheduler's determinism check) and pickled,
+    # minus their per-thread buffers
+    def __getstate__(self) -> dict:
+        state = self.__dict__.copy()
+        del state["_thread_state"]
+        return state
+
+    def __setstate__(self, state: dict) -> None:
+        self.__dict__.update(state)
+        self._thread_state = threading.local()
+
+        # The copied events have new ids
+        self._pooled = {id(event) for pool in self._pool.values() for event in pool}
+
     def subscribe(
         self, event_type: type[Event], callback: callable, priority: int = 0
     ) -> None:
         """Subscribe to an event with a priority (lower values fire first)"""
-        self._listeners.setdefault(event_type, []).append((priority, callback))
-        self._listeners[event_type].sort(key=lambda x: x[0])
+        self._listeners.setdefault(event_type, []).append(
+            (priority, next(self._subscriptions), callback)
+        )
+
+        self._invalidate()
+
+    def subscribe_batch(
+        self, event_type: type[Event], callback: callable, priority: int = 0
+    ) -> None:
+        """Subscribe to every event of a type published during a dispatch at once.
+        callback gets a list of events after the queue has been drained, so after
+        every subscribe() callback whatever its priority. priority only orders
+        batch subscribers among themselves.
+        """
+        self._batches.setdefault(event_type, [])
+        self._batch_listeners.append(
+            (priority, next(self._subscriptions), event_type, callback)
+        )
+        self._batch_listeners.sort(key=lambda x: x[:2])
+        self._invalidate()
+
+    def _invalidate(self) -> None:
+        # With fan-out, a new subscriber can affect any subclass's table
+        self._dispatch_table.clear()
+        if self.frozen:
+            self.freeze()
+
+    def freeze(self) -> None:
+        """Compile the dispatch table for every subscribed event type. Call once
+        all systems have registered; later subscriptions recompile it.
+        """
+        for event_type in chain(self._listeners, self._batches):
+            self._compile(event_type)
+
+        self.frozen = True
+
+    def _compile(self, event_type: type[Event]) -> tuple[callable, ...]:
+        types = event_type.__mro__ if self.fan_out else (event_type,)
+
+        listeners = sorted(
+            (listener for t in types for listener in self._listeners.get(t, ())),
+            key=lambda x: x[:2],
+        )
+
+        # Events for batch subscribers are just collected until the queue is empty
+        callbacks = tuple(callback for _, _, callback in listeners) + tuple(
+            self._batches[t].append for t in types if t in self._batches
+        )
+        self._dispatch_table[event_type] = callbacks
+        return callbacks
+
+    def acquire(self, event_type: type[Event], *args, **kwargs) -> Event:
+        """Return an event_type(*args, **kwargs), reusing a pooled event if there
+        is one.
+        """
+        pool = self._pool.get(event_type)
+        if not pool or self._buffering:
+            # Pools aren't shared between threads
+            return event_type(*args, **kwargs)
+
+        event = pool.pop()
+        self._pooled.discard(id(event))
+        event.__init__(*args, **kwargs)
+        return event
 
     def publish(self, event: Event) -> None:
+        if self._buffering:
+            buffer = getattr(self._thread_state, "buffer", None)
+            if buffer is not None:
+                buffer.append(event)
+                return
+
         self._queue.append(event)
 
+    def begin_buffering(self) -> None:
+        """Start publishing into per-thread buffers (see thread_buffer())."""
+        self._buffering = True
+
+    @contextmanager
+    def thread_buffer(self):
+        """Collect the events the current thread publishes while buffering into a
+        list, which is yielded.
+        """
+        buffer = []
+        self._thread_state.buffer = buffer
+        try:
+            yield buffer
+        finally:
+            self._thread_state.buffer = None
+
+    def end_buffering(self, buffers: list[list[Event]]) -> None:
+        """Stop buffering and queue the events in buffers, in order."""
+        self._buffering = False
+        for buffer in buffers:
+            self._queue.extend(buffer)
+
     def schedule(self, future_tick: int, event: Event) -> None:
-        heappush(self._scheduled_events, (future_tick, event))
+        """Publish event when time advances to future_tick. Events scheduled for
+        the same tick are published in the order they were scheduled.
+        """
+        self._scheduled_events.schedule(future_tick, event)
 
     def dispatch(self) -> None:
-        while self._queue:
-            event = self._queue.popleft()
-            # Callbacks are already sorted by priority
-            for _, callback in self._listeners.get(type(event), []):
-                callback(event)
+        queue = self._queue
+        popleft = queue.popleft
+        lookup = self._dispatch_table.get
+        recycle = self._dispatched.append if self.pool_size else None
+        while True:
+            while queue:
+                event = popleft()
+                callbacks = lookup(event.__class__)
+                if callbacks is None:
+                    callbacks = self._compile(event.__class__)
+
+                for callback in callbacks:
+                    callback(event)
+
+                if recycle is not None:
+                    recycle(event)
+
+            if not self._dispatch_batches():
+                break
+
+        if recycle is not None:
+            self._recycle()
+
+    def _recycle(self) -> None:
+        pooled = self._pooled
+        for event in self._dispatched:
+            # An event published more than once is only pooled once, or acquire
+            # would hand it out twice
+            if id(event) in pooled:
+                continue
+
+            pool = self._pool.setdefault(event.__class__, [])
+            if len(pool) < self.pool_size:
+                pool.append(event)
+                pooled.add(id(event))
+
+        self._dispatched.clear()
+
+    def _dispatch_batches(self) -> bool:
+        """Hand the collected events to batch subscribers. Returns whether there
+        were any.
+        """
+        batches = {}
+        for event_type, events in self._batches.items():
+            if events:
+                batches[event_type] = events.copy()
+                events.clear()
+
+        if not batches:
+            return False
+
+        for _, _, event_type, callback in self._batch_listeners:
+            events = batches.get(event_type)
+            if events:
+                callback(events)
+
+        return True
 
     def advance_time(self) -> None:
         self.current_tick += 1
-
-        while (
-            self._scheduled_events and self._scheduled_events[0][0] <= self.current_tick
-        ):
-            _, event = heappop(self._scheduled_events)
-            self.publish(event)
+        self._queue.extend(self._scheduled_events.advance())
 
 
-@dataclass
+@dataclass(slots=True)
 class TinkerTaskStartedEvent(Event):
     foo: Entity
 
 
-@dataclass
+@dataclass(slots=True)
 class SystemOwnerChangedEvent(Event):
     # Do these need to be entities or can they be concrete components?
     system: Entity
@@ -62,14 +262,14 @@ class SystemOwnerChangedEvent(Event):
     new_owner: Entity
 
 
-@dataclass
+@dataclass(slots=True)
 class FleetStartedRouteToSystemEvent(Event):
     fleet: Entity
     source: Entity
     target: Entity
 
 
-@dataclass
+@dataclass(slots=True)
 class FleetArrivedAtSystemEvent(Event):
     fleet: Entity
     system: Entity
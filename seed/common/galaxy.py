@@ -0,0 +1,25 @@
+import math
+
+import numpy as np
+
+
+def generate_galaxy(
+    num_systems: int = 200,
+    num_arms: int = 4,
+    arm_spread: float = 0.3,
+    radius: float = 30,
+    rng: np.random.Generator | None = None,
+) -> np.ndarray:
+    """Return the positions of num_systems (star) systems in a spiral galaxy as a
+    (num_systems, 2) array.
+    """
+    if rng is None:
+        rng = np.random.default_rng()
+
+    # Random distance from the center. Maybe have an actual distribution the
+    # distance follows instead of just uniform?
+    r = radius * rng.random(num_systems)
+    arm = rng.integers(num_arms, size=num_systems)
+    base_angle = (arm * (2 * math.pi / num_arms)) + (r / radius * 2 * math.pi)
+    angle = base_angle + rng.uniform(-arm_spread, arm_spread, num_systems)
+    return np.column_stack((r * np.cos(angle), r * np.sin(angle)))
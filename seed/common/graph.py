@@ -0,0 +1,238 @@
+from collections import OrderedDict, deque
+from heapq import heappush, heappop
+from itertools import count
+import math
+
+import numpy as np
+
+from seed.common.spatial import SpatialGrid
+
+
+# Every graph gets a new version when it is built, so anything derived from a graph
+# (e.g. cached routes) can tell whether it is still valid.
+_graph_versions = count(1)
+
+
+class CSRGraph:
+    """A weighted directed graph in compressed sparse row form.
+
+    The neighbors of node i are ``neighbors[offsets[i]:offsets[i + 1]]`` and the
+    matching edge weights are ``weights[offsets[i]:offsets[i + 1]]``. The arrays
+    are also kept as plain lists, which are much faster to index one element at a
+    time from Python.
+    """
+
+    def __init__(self, offsets: np.ndarray, neighbors: np.ndarray, weights: np.ndarray):
+        self.offsets = offsets
+        self.neighbors = neighbors
+        self.weights = weights
+        self.version = next(_graph_versions)
+
+        self.offsets_list: list[int] = offsets.tolist()
+        self.neighbors_list: list[int] = neighbors.tolist()
+        self.weights_list: list[float] = weights.tolist()
+
+    def __len__(self) -> int:
+        return len(self.offsets) - 1
+
+    @property
+    def num_edges(self) -> int:
+        return len(self.neighbors)
+
+    def neighbors_of(self, i: int) -> np.ndarray:
+        return self.neighbors[self.offsets[i] : self.offsets[i + 1]]
+
+    @classmethod
+    def within_range(cls, grid: SpatialGrid, max_distance: float) -> "CSRGraph":
+        """Connect every pair of points in grid that are at most max_distance
+        apart, weighted by their distance.
+        """
+        adjacency = [grid.query_point(i, max_distance) for i in range(len(grid))]
+
+        offsets = np.zeros(len(adjacency) + 1, dtype=np.int64)
+        np.cumsum([len(a) for a in adjacency], out=offsets[1:])
+
+        if adjacency:
+            neighbors = np.concatenate(adjacency).astype(np.int64)
+        else:
+            neighbors = np.empty(0, dtype=np.int64)
+
+        sources = np.repeat(np.arange(len(adjacency)), np.diff(offsets))
+        delta = grid.positions[neighbors] - grid.positions[sources]
+        weights = np.hypot(delta[:, 0], delta[:, 1])
+
+        return cls(offsets, neighbors, weights)
+
+
+def astar(
+    graph: CSRGraph,
+    positions: list[tuple[float, float]],
+    source: int,
+    target: int,
+    allowed: set[int] | None = None,
+) -> list[int]:
+    """Return the shortest path from source to target as a list of nodes, or an
+    empty list if target can't be reached. Edge weights must be at least the
+    straight-line distance between their endpoints.
+
+    If allowed is given, the search never leaves that set of nodes.
+    """
+    offsets = graph.offsets_list
+    neighbors = graph.neighbors_list
+    weights = graph.weights_list
+
+    tx, ty = positions[target]
+
+    def heuristic(i: int) -> float:
+        x, y = positions[i]
+        return math.hypot(x - tx, y - ty)
+
+    # Only the nodes the search touches get an entry
+    dist = {source: 0.0}
+    previous = {source: -1}
+
+    heap = [(heuristic(source), 0.0, source)]  # (priority, distance, node)
+    while heap:
+        _, current_dist, current = heappop(heap)
+        if current == target:
+            break
+        if current_dist > dist[current]:
+            continue
+        for k in range(offsets[current], offsets[current + 1]):
+            neighbor = neighbors[k]
+            if allowed is not None and neighbor not in allowed:
+                continue
+
+            weight = current_dist + weights[k]
+            if weight < dist.get(neighbor, math.inf):
+                dist[neighbor] = weight
+                previous[neighbor] = current
+                heappush(heap, (weight + heuristic(neighbor), weight, neighbor))
+    else:
+        return []
+
+    # Reconstruct the path
+    path = deque()
+    curr = target
+    while curr != -1:
+        path.appendleft(curr)
+        curr = previous[curr]
+
+    return list(path)
+
+
+def dijkstra(
+    graph: CSRGraph, source: int, allowed: set[int] | None = None
+) -> dict[int, float]:
+    """Return the distance from source to every node it can reach. If allowed is
+    given, the search never leaves that set of nodes.
+    """
+    offsets = graph.offsets_list
+    neighbors = graph.neighbors_list
+    weights = graph.weights_list
+
+    dist = {source: 0.0}
+    heap = [(0.0, source)]
+    while heap:
+        current_dist, current = heappop(heap)
+        if current_dist > dist[current]:
+            continue
+        for k in range(offsets[current], offsets[current + 1]):
+            neighbor = neighbors[k]
+            if allowed is not None and neighbor not in allowed:
+                continue
+
+            weight = current_dist + weights[k]
+            if weight < dist.get(neighbor, math.inf):
+                dist[neighbor] = weight
+                heappush(heap, (weight, neighbor))
+
+    return dist
+
+
+def shortest_path_tree(
+    graph: CSRGraph, source: int, targets: set[int] | None = None
+) -> dict[int, int]:
+    """Run Dijkstra from source until every node in targets is settled (or the whole
+    graph, if targets is None). Returns the predecessor of every node reached, with
+    -1 for the source.
+    """
+    offsets = graph.offsets_list
+    neighbors = graph.neighbors_list
+    weights = graph.weights_list
+
+    remaining = set(targets) if targets is not None else None
+    dist = {source: 0.0}
+    previous = {source: -1}
+    heap = [(0.0, source)]
+    while heap:
+        current_dist, current = heappop(heap)
+        if current_dist > dist[current]:
+            continue
+        if remaining is not None:
+            remaining.discard(current)
+            if not remaining:
+                break
+        for k in range(offsets[current], offsets[current + 1]):
+            neighbor = neighbors[k]
+            weight = current_dist + weights[k]
+            if weight < dist.get(neighbor, math.inf):
+                dist[neighbor] = weight
+                previous[neighbor] = current
+                heappush(heap, (weight, neighbor))
+
+    return previous
+
+
+def tree_path(previous: dict[int, int], node: int) -> list[int]:
+    """Return the path from the root of a shortest_path_tree to node, or an empty
+    list if node wasn't reached.
+    """
+    if node not in previous:
+        return []
+
+    path = []
+    while node != -1:
+        path.append(node)
+        node = previous[node]
+
+    path.reverse()
+    return path
+
+
+class RouteCache:
+    """LRU cache of paths, keyed by (ship range, source, target).
+
+    Each entry remembers the version of the graph it was computed on and is
+    treated as a miss once that graph has been rebuilt.
+    """
+
+    def __init__(self, max_size: int = 4096):
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+
+        # (ship range, source, target) -> (graph version, path)
+        self._entries: OrderedDict[tuple, tuple[int, tuple[int, ...]]] = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: tuple, version: int) -> tuple[int, ...] | None:
+        entry = self._entries.get(key)
+        if entry is None or entry[0] != version:
+            self.misses += 1
+            return None
+
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return entry[1]
+
+    def put(self, key: tuple, version: int, path: tuple[int, ...]) -> None:
+        self._entries[key] = (version, path)
+        self._entries.move_to_end(key)
+        if len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        self._entries.clear()
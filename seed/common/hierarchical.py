@@ -0,0 +1,272 @@
+"""Two-level (cluster and portal) pathfinding for very large galaxies."""
+
+import math
+from heapq import heappush, heappop
+from itertools import chain
+
+import numpy as np
+
+from seed.common.graph import CSRGraph, RouteCache, astar, dijkstra
+
+
+class HierarchicalRouter:
+    """Two-level router over a CSRGraph whose nodes have 2D positions."""
+
+    def __init__(
+        self,
+        graph: CSRGraph,
+        positions: list[tuple[float, float]],
+        cluster_size: float,
+        portal_spacing: float = 0.0,
+        epsilon: float = 0.0,
+        max_stretch: float | None = None,
+        local_path_cache_size: int = 65536,
+        num_landmarks: int = 8,
+    ):
+        self.graph = graph
+        self.positions = positions
+        self.cluster_size = cluster_size
+
+        # With portal_spacing=0 every crossing edge is an entrance and paths are
+        # optimal. A larger spacing shrinks the abstract graph, but the detours it
+        # causes inside sparse clusters have no bound.
+        self.portal_spacing = portal_spacing
+
+        # The abstract search is a weighted A*, whose paths are at most
+        # (1 + epsilon) times longer than the best abstract path
+        self.epsilon = epsilon
+
+        # Refined paths longer than max_stretch times a lower bound on the optimal
+        # length are replaced by a flat A* search
+        self.max_stretch = max_stretch
+
+        # Queries whose refined path was too long for max_stretch
+        self.fallbacks = 0
+
+        # Node -> cluster, and cluster -> member nodes
+        cells = {}
+        self.cluster_of: list[int] = []
+        for x, y in positions:
+            cell = (math.floor(x / cluster_size), math.floor(y / cluster_size))
+            self.cluster_of.append(cells.setdefault(cell, len(cells)))
+
+        # Cluster -> grid cell
+        self.cluster_cells: list[tuple[int, int]] = list(cells)
+
+        self.members: list[set[int]] = [set() for _ in cells]
+        for node, cluster in enumerate(self.cluster_of):
+            self.members[cluster].add(node)
+
+        # Pick the entrances: (cluster, other cluster, spacing cell) -> the shortest
+        # crossing edge (weight, node, neighbor) starting in that cell.
+        entrances = {}
+        offsets = graph.offsets_list
+        neighbors = graph.neighbors_list
+        weights = graph.weights_list
+        for node, cluster in enumerate(self.cluster_of):
+            if portal_spacing > 0:
+                x, y = positions[node]
+                cell = (math.floor(x / portal_spacing), math.floor(y / portal_spacing))
+
+            for k in range(offsets[node], offsets[node + 1]):
+                neighbor = neighbors[k]
+                other = self.cluster_of[neighbor]
+                if other == cluster:
+                    continue
+
+                if portal_spacing > 0:
+                    key = (cluster, other, cell)
+                else:
+                    key = (node, neighbor)
+
+                if key not in entrances or weights[k] < entrances[key][0]:
+                    entrances[key] = (weights[k], node, neighbor)
+
+        # Abstract graph: portal -> {portal: weight}. Entrances are added in both
+        # directions so routes into a cluster can use the same portals as routes
+        # out of it.
+        abstract: dict[int, dict[int, float]] = {}
+        for weight, node, neighbor in entrances.values():
+            abstract.setdefault(node, {})[neighbor] = weight
+            abstract.setdefault(neighbor, {})[node] = weight
+
+        self.portals: list[list[int]] = [[] for _ in cells]
+        for portal in abstract:
+            self.portals[self.cluster_of[portal]].append(portal)
+
+        # Portals in the same cluster are joined by their distance inside it
+        for cluster, portals in enumerate(self.portals):
+            for portal in portals:
+                dist = dijkstra(graph, portal, self.members[cluster])
+                for other in portals:
+                    if other != portal and other in dist:
+                        abstract[portal][other] = dist[other]
+
+        self.abstract: dict[int, list[tuple[int, float]]] = {
+            portal: list(edges.items()) for portal, edges in abstract.items()
+        }
+
+        # (from, to) -> path inside their shared cluster, for the most recently
+        # used pairs
+        self._local_paths = RouteCache(local_path_cache_size)
+
+        # Landmarks for the max_stretch lower bound |d(l, s) - d(l, t)|, which
+        # follows the graph around gaps the straight line cuts across, and node ->
+        # distance to each landmark (0 for nodes the landmarks can't reach)
+        self.landmarks: list[int] = []
+        self._landmark_dist = np.zeros((len(graph), 0))
+        if max_stretch is not None:
+            self._pick_landmarks(num_landmarks)
+
+    @property
+    def num_portals(self) -> int:
+        return len(self.abstract)
+
+    def _distances(self, source: int) -> np.ndarray:
+        dist = dijkstra(self.graph, source)
+        out = np.full(len(self.graph), np.inf)
+        out[list(dist)] = list(dist.values())
+        return out
+
+    def _pick_landmarks(self, num_landmarks: int) -> None:
+        # Spread the landmarks over the component of the best connected node: each
+        # is the node farthest from the landmarks picked before it.
+        start = int(np.argmax(np.diff(self.graph.offsets)))
+        dist = self._distances(start)
+        reachable = np.isfinite(dist)
+        nearest = np.where(reachable, dist, -1.0)
+
+        columns = []
+        for _ in range(num_landmarks):
+            landmark = int(np.argmax(nearest))
+            if nearest[landmark] <= 0:
+                break
+
+            dist = self._distances(landmark)
+            self.landmarks.append(landmark)
+            columns.append(np.where(reachable, dist, 0.0))
+            nearest = np.minimum(nearest, np.where(reachable, dist, -1.0))
+
+        if columns:
+            self._landmark_dist = np.column_stack(columns)
+
+    def lower_bound(self, source: int, target: int) -> float:
+        """Return a lower bound on the length of the shortest path from source to
+        target.
+        """
+        bound = math.dist(self.positions[source], self.positions[target])
+        if self.landmarks:
+            dist = self._landmark_dist
+            bound = max(bound, float(np.abs(dist[source] - dist[target]).max()))
+
+        return bound
+
+    def _local_path(self, source: int, target: int) -> list[int]:
+        key = (source, target)
+        path = self._local_paths.get(key, self.graph.version)
+        if path is None:
+            members = self.members[self.cluster_of[source]]
+            path = tuple(astar(self.graph, self.positions, source, target, members))
+            self._local_paths.put(key, self.graph.version, path)
+
+        return path
+
+    def find_path(self, source: int, target: int) -> list[int]:
+        """Return a path from source to target as a list of nodes, or an empty list
+        if target can't be reached.
+        """
+        if source == target:
+            return [source]
+
+        # Short routes are cheap to search directly, and are where detours through
+        # portals would cost the most relative to the route's length.
+        source_cluster = self.cluster_of[source]
+        target_cluster = self.cluster_of[target]
+        sx, sy = self.cluster_cells[source_cluster]
+        tx, ty = self.cluster_cells[target_cluster]
+        if abs(sx - tx) <= 1 and abs(sy - ty) <= 1:
+            return astar(self.graph, self.positions, source, target)
+
+        # Temporary abstract edges out of the source and into the target
+        extra: dict[int, list[tuple[int, float]]] = {}
+
+        dist = dijkstra(self.graph, source, self.members[source_cluster])
+        extra[source] = [
+            (portal, dist[portal])
+            for portal in self.portals[source_cluster]
+            if portal in dist and portal != source
+        ]
+        if target in dist:
+            extra[source].append((target, dist[target]))
+
+        # The graph is undirected, so distances from the target are distances to it
+        dist = dijkstra(self.graph, target, self.members[target_cluster])
+        for portal in self.portals[target_cluster]:
+            if portal in dist and portal != target:
+                extra.setdefault(portal, []).append((target, dist[portal]))
+
+        abstract_path = self._search(source, target, extra)
+        if not abstract_path:
+            # With sparse entrances a path may exist that the abstract graph
+            # misses (e.g. a cluster split into pieces with no portal), so only a
+            # flat search can say that target is unreachable.
+            return astar(self.graph, self.positions, source, target)
+
+        # Refine: hops within a cluster expand into a local path, hops between
+        # clusters are already edges of the original graph.
+        path = [source]
+        for a, b in zip(abstract_path, abstract_path[1:]):
+            if self.cluster_of[a] == self.cluster_of[b]:
+                path.extend(self._local_path(a, b)[1:])
+            else:
+                path.append(b)
+
+        if self.max_stretch is not None:
+            positions = self.positions
+            length = sum(
+                math.dist(positions[a], positions[b]) for a, b in zip(path, path[1:])
+            )
+            if length > self.max_stretch * self.lower_bound(source, target):
+                self.fallbacks += 1
+                return astar(self.graph, self.positions, source, target)
+
+        return path
+
+    def _search(
+        self, source: int, target: int, extra: dict[int, list[tuple[int, float]]]
+    ) -> list[int]:
+        positions = self.positions
+        tx, ty = positions[target]
+        h_weight = 1.0 + self.epsilon
+
+        def heuristic(i: int) -> float:
+            x, y = positions[i]
+            return h_weight * math.hypot(x - tx, y - ty)
+
+        dist = {source: 0.0}
+        previous = {source: -1}
+        heap = [(heuristic(source), 0.0, source)]
+        while heap:
+            _, current_dist, current = heappop(heap)
+            if current == target:
+                break
+            if current_dist > dist[current]:
+                continue
+            for neighbor, edge in chain(
+                self.abstract.get(current, ()), extra.get(current, ())
+            ):
+                weight = current_dist + edge
+                if weight < dist.get(neighbor, math.inf):
+                    dist[neighbor] = weight
+                    previous[neighbor] = current
+                    heappush(heap, (weight + heuristic(neighbor), weight, neighbor))
+        else:
+            return []
+
+        path = []
+        while target != -1:
+            path.append(target)
+            target = previous[target]
+
+        path.reverse()
+        return path
@@ -0,0 +1,264 @@
+"""Message propagation between systems under light-speed lag.
+
+A message sent at tick t from system s reaches system r at tick
+t + ceil(distance(s, r) / speed), and at least one tick later. A broadcast is
+stored once: its delivery ticks to every receiver come from one vectorized pass
+over the sender's row of the distance matrix, and the receivers are bucketed by
+delivery tick in a TimerWheel that all messages share.
+
+When a tick's deliveries arrive they are only sorted by receiver, not copied
+into per-system inboxes. A system's inbox is materialized when it asks for it
+with inbox(), from every tick that arrived since it last asked.
+
+A tick's block of deliveries is freed once every receiver in it has read it. So
+that a few systems that rarely (or never) read can't keep every block alive,
+the oldest block is split up once most of its receivers have read it: the
+deliveries still unread are moved to per-receiver lists and the block is freed.
+Memory then grows with the number of unread deliveries, not with the history.
+Systems that will never read can stop listening, and their deliveries are
+dropped as they arrive.
+"""
+
+from bisect import bisect_right
+from dataclasses import dataclass
+import math
+
+import numpy as np
+
+from seed.common.distances import DistanceMatrix
+from seed.common.timer_wheel import TimerWheel
+
+
+@dataclass(slots=True)
+class Message:
+    sender: int
+    sent_tick: int
+    payload: object
+
+    # Receivers that haven't read the message yet
+    unread: int = 0
+
+
+class LightspeedNetwork:
+    """Delivers messages between the points of a DistanceMatrix (e.g. systems, by
+    their index in RoutingSystem.systems) at speed distance units per tick.
+    """
+
+    def __init__(
+        self, distances: DistanceMatrix, speed: float = 1.0, start_tick: int = 0
+    ):
+        self.distances = distances
+        self.speed = speed
+        self.current_tick = start_tick
+
+        self._messages: dict[int, Message] = {}
+        self._next_id = 0
+
+        # Delivery tick -> (message id, receivers), not delivered yet
+        self._pending = TimerWheel(start_tick)
+        self.in_flight = 0
+
+        # Delivered deliveries, one block per tick: the receivers sorted, and the
+        # message delivered to each of them. A block every receiver has read is
+        # replaced by None until it reaches the front and can be dropped.
+        self._block_ticks: list[int] = []
+        self._blocks: list[tuple[np.ndarray, np.ndarray] | None] = []
+
+        # Number of distinct receivers in each block, and how many of them haven't
+        # read it yet
+        self._block_receivers: list[int] = []
+        self._block_unread: list[int] = []
+
+        # Receiver -> ids of its unread messages moved out of freed blocks, oldest
+        # first. These are always older than the blocks still kept.
+        self._spilled: dict[int, list[int]] = {}
+
+        # Receiver -> last tick it read its inbox
+        self._read_until = np.full(len(distances), start_tick, dtype=np.int64)
+
+        # Deliveries to receivers that aren't listening are dropped on arrival
+        self._listening = np.ones(len(distances), dtype=bool)
+        self._num_muted = 0
+        self.dropped = 0
+
+    def _delays(self, distances: np.ndarray) -> np.ndarray:
+        return np.maximum(np.ceil(distances / self.speed), 1).astype(np.int64)
+
+    def _add_message(self, sender: int, payload, receivers: int) -> int:
+        message_id = self._next_id
+        self._next_id += 1
+        self._messages[message_id] = Message(
+            sender, self.current_tick, payload, receivers
+        )
+        self.in_flight += receivers
+        return message_id
+
+    def send(self, sender: int, receiver: int, payload) -> int:
+        """Send payload from one system to another. Returns the message id."""
+        message_id = self._add_message(sender, payload, 1)
+        distance = self.distances.distance(sender, receiver)
+        delay = max(math.ceil(distance / self.speed), 1)
+        self._pending.schedule(
+            self.current_tick + delay, (message_id, np.array([receiver]))
+        )
+        return message_id
+
+    def broadcast(self, sender: int, payload, max_range: float = math.inf) -> int:
+        """Send payload from sender to every other system within max_range.
+        Returns the message id.
+        """
+        distances = self.distances.row(sender)
+        in_range = distances <= max_range
+        in_range[sender] = False
+        receivers = np.flatnonzero(in_range)
+
+        if not len(receivers):
+            # Nobody to deliver to, so there's nothing to keep
+            message_id = self._next_id
+            self._next_id += 1
+            return message_id
+
+        message_id = self._add_message(sender, payload, len(receivers))
+
+        # Group the receivers by delivery tick
+        delays = self._delays(distances[receivers])
+        order = np.argsort(delays, kind="stable")
+        receivers = receivers[order]
+        delays = delays[order]
+
+        starts = np.flatnonzero(np.diff(delays, prepend=-1))
+        ends = np.append(starts[1:], len(delays))
+        for start, end, delay in zip(
+            starts.tolist(), ends.tolist(), delays[starts].tolist()
+        ):
+            self._pending.schedule(
+                self.current_tick + delay, (message_id, receivers[start:end])
+            )
+
+        return message_id
+
+    def set_listening(self, receiver: int, listening: bool) -> None:
+        """Start or stop delivering messages to receiver. Deliveries to a receiver
+        that isn't listening are dropped when they arrive.
+        """
+        if self._listening[receiver] != listening:
+            self._listening[receiver] = listening
+            self._num_muted += -1 if listening else 1
+
+    def advance(self) -> None:
+        """Move to the next tick, delivering everything due on it."""
+        due = self._pending.advance()
+        self.current_tick = self._pending.current_tick
+        if due:
+            receivers = np.concatenate([r for _, r in due])
+            messages = np.repeat(
+                np.array([m for m, _ in due], dtype=np.int64), [len(r) for _, r in due]
+            )
+            self.in_flight -= len(receivers)
+
+            if self._num_muted:
+                listening = self._listening[receivers]
+                self._forget(messages[~listening])
+                self.dropped += len(receivers) - int(listening.sum())
+                receivers = receivers[listening]
+                messages = messages[listening]
+
+            if len(receivers):
+                self._add_block(receivers, messages)
+
+        self._drop_read_blocks()
+
+    def _add_block(self, receivers: np.ndarray, messages: np.ndarray) -> None:
+        # Stable, so each receiver reads its messages in the order they arrived
+        order = np.argsort(receivers, kind="stable")
+        receivers = receivers[order]
+        num_receivers = int(np.count_nonzero(np.diff(receivers))) + 1
+
+        self._block_ticks.append(self.current_tick)
+        self._blocks.append((receivers, messages[order]))
+        self._block_receivers.append(num_receivers)
+        self._block_unread.append(num_receivers)
+
+    def _forget(self, message_ids: np.ndarray) -> None:
+        """Count one receiver fewer for every delivery of message_ids."""
+        message_ids, counts = np.unique(message_ids, return_counts=True)
+        for message_id, count in zip(message_ids.tolist(), counts.tolist()):
+            message = self._messages[message_id]
+            message.unread -= count
+            if not message.unread:
+                del self._messages[message_id]
+
+    def _drop_read_blocks(self) -> None:
+        # Drop the blocks at the front that every receiver has read, and split up
+        # the ones only a few receivers haven't
+        dropped = 0
+        for k in range(len(self._blocks)):
+            block = self._blocks[k]
+            if block is not None:
+                if 4 * self._block_unread[k] > self._block_receivers[k]:
+                    break
+
+                self._spill(self._block_ticks[k], *block)
+
+            dropped += 1
+
+        if dropped:
+            del self._block_ticks[:dropped]
+            del self._blocks[:dropped]
+            del self._block_receivers[:dropped]
+            del self._block_unread[:dropped]
+
+    def _spill(self, tick: int, receivers: np.ndarray, messages: np.ndarray):
+        """Move the deliveries of a block that haven't been read to the receivers'
+        spilled lists.
+        """
+        unread = self._read_until[receivers] < tick
+        for receiver, message_id in zip(
+            receivers[unread].tolist(), messages[unread].tolist()
+        ):
+            spilled = self._spilled.get(receiver)
+            if spilled is None:
+                self._spilled[receiver] = spilled = []
+            spilled.append(message_id)
+
+    def inbox(self, receiver: int) -> list[Message]:
+        """Return the messages delivered to receiver since the last time it called
+        inbox(), oldest first.
+        """
+        start = bisect_right(self._block_ticks, int(self._read_until[receiver]))
+        self._read_until[receiver] = self.current_tick
+
+        message_ids = self._spilled.pop(receiver, [])
+        for k in range(start, len(self._blocks)):
+            block = self._blocks[k]
+            if block is None:
+                continue
+
+            receivers, messages = block
+            lo = receivers.searchsorted(receiver)
+            hi = receivers.searchsorted(receiver, "right")
+            if lo == hi:
+                continue
+
+            message_ids.extend(messages[lo:hi].tolist())
+            self._block_unread[k] -= 1
+            if not self._block_unread[k]:
+                self._blocks[k] = None
+
+        inbox = []
+        for message_id in message_ids:
+            message = self._messages[message_id]
+            message.unread -= 1
+            if not message.unread:
+                del self._messages[message_id]
+
+            inbox.append(message)
+
+        return inbox
+
+    @property
+    def unread(self) -> int:
+        """Number of deliveries that have arrived but haven't been read."""
+        return sum(message.unread for message in self._messages.values()) - (
+            self.in_flight
+        )
@@ -0,0 +1,55 @@
+import math
+
+import numpy as np
+
+
+class SpatialGrid:
+    """A uniform grid over a fixed set of 2D points for fixed-radius queries.
+
+    Points are bucketed into square cells. A query only looks at the cells that
+    overlap the query circle, so with a cell size close to the typical query radius
+    it touches a handful of cells instead of every point.
+    """
+
+    def __init__(self, positions, cell_size: float):
+        self.cell_size = cell_size
+        self.positions = np.asarray(positions, dtype=np.float64).reshape(-1, 2)
+
+        cells = {}
+        coords = np.floor(self.positions / cell_size).astype(np.int64)
+        for i, (cx, cy) in enumerate(coords.tolist()):
+            cells.setdefault((cx, cy), []).append(i)
+
+        # (cell x, cell y) -> indices of the points inside it
+        self.cells: dict[tuple[int, int], np.ndarray] = {
+            cell: np.array(points, dtype=np.int64) for cell, points in cells.items()
+        }
+
+    def __len__(self) -> int:
+        return len(self.positions)
+
+    def query(self, x: float, y: float, radius: float) -> np.ndarray:
+        """Return the indices of all points within radius of (x, y)."""
+        reach = math.ceil(radius / self.cell_size)
+        cx = math.floor(x / self.cell_size)
+        cy = math.floor(y / self.cell_size)
+
+        candidates = [
+            points
+            for i in range(cx - reach, cx + reach + 1)
+            for j in range(cy - reach, cy + reach + 1)
+            if (points := self.cells.get((i, j))) is not None
+        ]
+        if not candidates:
+            return np.empty(0, dtype=np.int64)
+
+        candidates = np.concatenate(candidates)
+        delta = self.positions[candidates] - (x, y)
+        within = np.einsum("ij,ij->i", delta, delta) <= radius * radius
+        return candidates[within]
+
+    def query_point(self, i: int, radius: float) -> np.ndarray:
+        """Return the indices of all other points within radius of point i."""
+        x, y = self.positions[i]
+        result = self.query(x, y, radius)
+        return result[result != i]
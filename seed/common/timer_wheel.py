@@ -0,0 +1,77 @@
+"""Hierarchical timing wheel for scheduling items a bounded number of ticks ahead.
+
+Ticks are grouped into blocks of num_slots ticks. The inner wheel has one slot per
+tick of the current block; the outer wheel has one slot per block for the next
+num_blocks - 1 blocks. When time enters a new block, that block's outer slot is
+cascaded into the inner wheel. Anything further ahead waits in an overflow heap and
+moves into the outer wheel once its block is in range.
+
+Scheduling within the wheels is O(1), draining a tick is O(items due), and items
+due on the same tick come out in the order they were scheduled.
+"""
+
+from heapq import heappush, heappop
+from itertools import count
+
+
+class TimerWheel:
+    def __init__(self, start_tick: int = 0, num_slots: int = 256, num_blocks: int = 64):
+        self.current_tick = start_tick
+        self.num_slots = num_slots
+        self.num_blocks = num_blocks
+
+        self._inner: list[list] = [[] for _ in range(num_slots)]
+        self._outer: list[list[tuple[int, object]]] = [[] for _ in range(num_blocks)]
+
+        # (tick, scheduling order, item), ordered so ties keep scheduling order
+        self._overflow: list[tuple[int, int, object]] = []
+        self._order = count()
+        self._size = 0
+
+    def __len__(self) -> int:
+        return self._size
+
+    def schedule(self, tick: int, item) -> None:
+        """Schedule item to come out of advance() at tick. Ticks that aren't in the
+        future are due on the next advance().
+        """
+        tick = max(tick, self.current_tick + 1)
+        self._size += 1
+        self._insert(tick, item)
+
+    def _insert(self, tick: int, item) -> None:
+        blocks_ahead = tick // self.num_slots - self.current_tick // self.num_slots
+        if blocks_ahead == 0:
+            self._inner[tick % self.num_slots].append(item)
+        elif blocks_ahead < self.num_blocks:
+            block = tick // self.num_slots
+            self._outer[block % self.num_blocks].append((tick, item))
+        else:
+            heappush(self._overflow, (tick, next(self._order), item))
+
+    def advance(self) -> list:
+        """Move to the next tick and return the items due on it."""
+        self.current_tick += 1
+        tick = self.current_tick
+
+        if tick % self.num_slots == 0:
+            # A new block: the overflow items whose block just came into range go
+            # to the outer wheel, then this block's items go to the inner wheel.
+            last_block = tick // self.num_slots + self.num_blocks - 1
+            overflow = self._overflow
+            while overflow and overflow[0][0] // self.num_slots <= last_block:
+                due, _, item = heappop(overflow)
+                self._insert(due, item)
+
+            slot = self._outer[tick // self.num_slots % self.num_blocks]
+            for due, item in slot:
+                self._inner[due % self.num_slots].append(item)
+            slot.clear()
+
+        slot = self._inner[tick % self.num_slots]
+        if not slot:
+            return []
+
+        self._inner[tick % self.num_slots] = []
+        self._size -= len(slot)
+        return slot
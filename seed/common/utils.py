@@ -4,8 +4,24 @@ from seed.common.base_types import *
 
 
 def transfer_system_ownership(
-    w: WorldState, event_bus: EventBus, system: Entity, new_owner: Entity
+    w: WorldState,
+    event_bus: EventBus,
+    system: Entity,
+    new_owner: Entity,
+    replica: bool = False,
 ) -> None:
+    """Give system to new_owner (None to leave it unowned).
+
+    Halo replicas (see seed.sharding) mirror systems owned by another shard and
+    can't change hands locally; only the shard refreshing them passes replica=True.
+    """
+    if not replica and w.has_component(system, HaloComponent):
+        halo = w.get_entity_component(system, HaloComponent)
+        raise ValueError(
+            f"System {system} is a halo replica of a system owned by shard "
+            f"{halo.shard}, so its owner can't be changed here"
+        )
+
     sys_comp = w.get_entity_component(system, SystemComponent)
     old_owner = sys_comp.owning_civ
 
@@ -13,13 +29,20 @@ def transfer_system_ownership(
     if old_owner:
         old_civ = w.get_entity_component(old_owner, CivilizationComponent)
         old_civ.owned_systems.remove(system)
+        w.mark_modified(old_owner, CivilizationComponent)
 
     if new_owner:
         new_civ = w.get_entity_component(new_owner, CivilizationComponent)
         new_civ.owned_systems.append(system)
+        w.mark_modified(new_owner, CivilizationComponent)
 
     sys_comp.owning_civ = new_owner
 
     event_bus.publish(
-        SystemOwnerChangedEvent(system=system, old_owner=old_owner, new_owner=new_owner)
+        event_bus.acquire(
+            SystemOwnerChangedEvent,
+            system=system,
+            old_owner=old_owner,
+            new_owner=new_owner,
+        )
     )
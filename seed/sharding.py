@@ -0,0 +1,413 @@
+"""Run one galaxy across several processes, each owning a region of it.
+
+Systems are partitioned into rectangular regions, one per shard, and every shard
+runs in its own process with its own WorldState, EventBus and Scheduler. Besides
+the systems it owns, a shard holds read-only halo replicas of the systems within
+halo_range of its region, so neighbor queries and routing near its borders
+work locally. Halo replicas don't build ships, and their owners can only be
+changed by the shard that owns them.
+
+Ticks are synchronized by the coordinator (ShardedGalaxy), which also acts as
+the tick barrier:
+
+    * system positions, the shard of every system and system owners live in
+      shared memory, so no per-system array is ever pickled;
+    * owners are double buffered by tick parity: during tick t every shard reads
+      its halo owners from buffer t % 2 and writes the owners of its own systems
+      to buffer (t + 1) % 2, which nobody reads until tick t + 1;
+    * a fleet parked at a halo system at the end of a tick has crossed into the
+      shard that owns the system. It is removed and sent to that shard as a
+      packed (civ, size, system) row, and shows up there at the start of the
+      next tick.
+
+Civs and systems are addressed by their global ids across shards: systems by
+their index in positions, civs by their index in range(num_civs). Owners are
+stored as civ + 1, with 0 meaning unowned.
+"""
+
+from multiprocessing import shared_memory
+import multiprocessing
+
+import numpy as np
+
+from seed.world_state import WorldState
+from seed.common.events import EventBus
+from seed.common.base_types import (
+    Entity,
+    SystemComponent,
+    CivilizationComponent,
+    FleetComponent,
+    HaloComponent,
+)
+from seed.common.utils import transfer_system_ownership
+from seed.systems import RoutingSystem, Scheduler
+
+
+def partition_grid(
+    positions: np.ndarray, cols: int, rows: int
+) -> tuple[np.ndarray, list[tuple[float, float, float, float]]]:
+    """Split positions into cols x rows rectangular regions with roughly the same
+    number of systems each: columns by x quantiles, then every column by y
+    quantiles.
+
+    Returns the shard of every system and the (x0, y0, x1, y1) bounds of every
+    shard's region.
+    """
+    shard_of = np.empty(len(positions), dtype=np.int32)
+    bounds = []
+
+    x_edges = np.quantile(positions[:, 0], np.linspace(0, 1, cols + 1))
+    x_edges[0], x_edges[-1] = -np.inf, np.inf
+    column = np.searchsorted(x_edges, positions[:, 0], "right") - 1
+    column = np.clip(column, 0, cols - 1)
+
+    for c in range(cols):
+        in_column = np.flatnonzero(column == c)
+        y_edges = np.quantile(positions[in_column, 1], np.linspace(0, 1, rows + 1))
+        y_edges[0], y_edges[-1] = -np.inf, np.inf
+        row = np.searchsorted(y_edges, positions[in_column, 1], "right") - 1
+        shard_of[in_column] = c * rows + np.clip(row, 0, rows - 1)
+
+        for r in range(rows):
+            bounds.append((x_edges[c], y_edges[r], x_edges[c + 1], y_edges[r + 1]))
+
+    return shard_of, bounds
+
+
+def halo_systems(
+    positions: np.ndarray,
+    shard_of: np.ndarray,
+    bounds: tuple[float, float, float, float],
+    shard: int,
+    halo_range: float,
+) -> np.ndarray:
+    """Return the systems owned by other shards that lie within halo_range of the
+    shard's region (measured per axis, so a few corner systems slightly further
+    away are included too).
+    """
+    x0, y0, x1, y1 = bounds
+    x, y = positions[:, 0], positions[:, 1]
+    near = (
+        (x >= x0 - halo_range)
+        & (x < x1 + halo_range)
+        & (y >= y0 - halo_range)
+        & (y < y1 + halo_range)
+    )
+    return np.flatnonzero(near & (shard_of != shard))
+
+
+def default_systems(w: WorldState, event_bus: EventBus) -> list:
+    return [RoutingSystem(w, event_bus)]
+
+
+class _SharedArray:
+    """A NumPy array backed by a named shared memory block."""
+
+    def __init__(self, shape, dtype, name: str | None = None):
+        nbytes = max(int(np.prod(shape)) * np.dtype(dtype).itemsize, 1)
+        self.shm = shared_memory.SharedMemory(
+            name=name, create=name is None, size=nbytes
+        )
+        self.array = np.ndarray(shape, dtype=dtype, buffer=self.shm.buf)
+        self.spec = (shape, np.dtype(dtype).str, self.shm.name)
+
+    @classmethod
+    def attach(cls, spec) -> "_SharedArray":
+        shape, dtype, name = spec
+        return cls(shape, dtype, name)
+
+    def close(self, unlink: bool = False) -> None:
+        del self.array
+        self.shm.close()
+        if unlink:
+            self.shm.unlink()
+
+
+class Shard:
+    """The part of the galaxy one worker process simulates."""
+
+    def __init__(self, shard: int, config: dict):
+        self.shard = shard
+        self.positions = _SharedArray.attach(config["positions"])
+        self.shard_of = _SharedArray.attach(config["shard_of"])
+        self.owners = _SharedArray.attach(config["owners"])
+
+        positions = self.positions.array
+        shard_of = self.shard_of.array
+        owners = self.owners.array[0]
+
+        self.owned = np.flatnonzero(shard_of == shard)
+        self.halo = halo_systems(
+            positions, shard_of, config["bounds"][shard], shard, config["halo_range"]
+        )
+
+        self.w = WorldState()
+        self.event_bus = EventBus()
+
+        # Global civ id -> local entity
+        self.civs: list[Entity] = [
+            self.w.add_entity(CivilizationComponent(ship_range=config["ship_range"]))
+            for _ in range(config["num_civs"])
+        ]
+
+        # Global system id -> local entity (0 for systems this shard doesn't hold),
+        # and local entity -> global system id
+        self.system_entities = np.zeros(len(positions), dtype=np.int64)
+        self.global_ids: dict[Entity, int] = {}
+
+        for ids, halo in ((self.owned, False), (self.halo, True)):
+            for i in ids.tolist():
+                owner = int(owners[i])
+                system = SystemComponent(
+                    position=tuple(positions[i].tolist()),
+                    owning_civ=self.civs[owner - 1] if owner else None,
+                )
+                if halo:
+                    entity = self.w.add_entity(system, HaloComponent(int(shard_of[i])))
+                else:
+                    entity = self.w.add_entity(system)
+
+                # Civs own their halo systems locally too, so reachability near the
+                # border is the same as in an unsharded galaxy. SystemSystem and
+                # CivilizationSystem leave halo systems to the shard that owns them.
+                if owner:
+                    civ = self.w.get_entity_component(
+                        self.civs[owner - 1], CivilizationComponent
+                    )
+                    civ.owned_systems.append(entity)
+
+                self.system_entities[i] = entity
+                self.global_ids[entity] = i
+
+        self.add_fleets(config["fleets"])
+
+        self.scheduler = Scheduler(
+            self.w, self.event_bus, config["make_systems"](self.w, self.event_bus)
+        )
+
+    def add_fleets(self, fleets: np.ndarray) -> None:
+        """Add fleets from packed (civ, size, system) rows."""
+        if len(fleets):
+            self.w.add_entities(
+                [
+                    FleetComponent(
+                        owning_civ=self.civs[civ],
+                        size=size,
+                        parked_system=int(self.system_entities[system]),
+                    )
+                    for civ, size, system in fleets.tolist()
+                ]
+            )
+
+    def refresh_halo(self, tick: int) -> None:
+        """Copy the owners other shards published last tick into the halo replicas."""
+        owners = self.owners.array[tick % 2]
+        for i in self.halo.tolist():
+            owner = int(owners[i])
+            civ = self.civs[owner - 1] if owner else None
+            e_sys = int(self.system_entities[i])
+            system = self.w.get_entity_component(e_sys, SystemComponent)
+            if system.owning_civ != civ:
+                transfer_system_ownership(
+                    self.w, self.event_bus, e_sys, civ, replica=True
+                )
+
+    def publish_owners(self, tick: int) -> None:
+        owners = self.owners.array[(tick + 1) % 2]
+        civ_ids = {entity: k + 1 for k, entity in enumerate(self.civs)}
+        for i in self.owned.tolist():
+            system = self.w.get_entity_component(
+                int(self.system_entities[i]), SystemComponent
+            )
+            owners[i] = civ_ids.get(system.owning_civ, 0)
+
+    def collect_crossings(self) -> dict[int, bytes]:
+        """Remove the fleets parked at halo systems and pack them by the shard that
+        owns the system.
+        """
+        civ_ids = {entity: k for k, entity in enumerate(self.civs)}
+        fleets_by_system = self.w.index(FleetComponent, "parked_system")
+
+        outgoing: dict[int, list[tuple[int, int, int]]] = {}
+        for e_sys, (halo,) in self.w.get_components(HaloComponent):
+            for e_fleet in list(fleets_by_system[e_sys]):
+                fleet = self.w.get_entity_component(e_fleet, FleetComponent)
+                outgoing.setdefault(halo.shard, []).append(
+                    (civ_ids[fleet.owning_civ], fleet.size, self.global_ids[e_sys])
+                )
+                self.w.despawn(e_fleet)
+
+        return {
+            shard: np.array(rows, dtype=np.int64).tobytes()
+            for shard, rows in outgoing.items()
+        }
+
+    def tick(self, tick: int, incoming: list[bytes]) -> tuple[dict[int, bytes], dict]:
+        self.refresh_halo(tick)
+        for data in incoming:
+            self.add_fleets(np.frombuffer(data, dtype=np.int64).reshape(-1, 3))
+
+        # Let systems see the halo changes before they update
+        self.event_bus.dispatch()
+
+        self.scheduler.tick()
+
+        outgoing = self.collect_crossings()
+        self.w.flush_despawned()
+        self.publish_owners(tick)
+
+        fleets = self.w.get_components(FleetComponent)
+        stats = {
+            "fleets": len(fleets),
+            "ships": sum(fleet.size for _, (fleet,) in fleets),
+            "crossings": sum(len(data) // 24 for data in outgoing.values()),
+        }
+        return outgoing, stats
+
+    def close(self) -> None:
+        self.scheduler.close()
+        for shared in (self.positions, self.shard_of, self.owners):
+            shared.close()
+
+
+def _run_shard(shard: int, config: dict, conn) -> None:
+    worker = Shard(shard, config)
+    worker.scheduler.start()
+    conn.send(None)
+
+    try:
+        while (message := conn.recv()) is not None:
+            conn.send(worker.tick(*message))
+    finally:
+        worker.close()
+        conn.close()
+
+
+class ShardedGalaxy:
+    """Coordinates the shard processes of one galaxy. Use as a context manager, or
+    call close() to stop the workers and free the shared memory.
+
+    fleets holds the starting fleets as (civ, size, system) rows. make_systems is
+    called in every worker with its WorldState and EventBus to create the systems
+    it runs, and must be picklable (e.g. a module-level function).
+    """
+
+    def __init__(
+        self,
+        positions: np.ndarray,
+        owners: np.ndarray,
+        num_civs: int,
+        fleets: np.ndarray | None = None,
+        cols: int = 2,
+        rows: int = 2,
+        ship_range: int = 8,
+        halo_range: float | None = None,
+        make_systems=default_systems,
+    ):
+        positions = np.asarray(positions, dtype=np.float64).reshape(-1, 2)
+        shard_of, bounds = partition_grid(positions, cols, rows)
+        self.num_shards = cols * rows
+        self.current_tick = 0
+
+        self._positions = _SharedArray(positions.shape, np.float64)
+        self._positions.array[:] = positions
+        self._shard_of = _SharedArray(shard_of.shape, np.int32)
+        self._shard_of.array[:] = shard_of
+        self._owners = _SharedArray((2, len(positions)), np.int64)
+        self._owners.array[:] = owners
+        self._shared = (self._positions, self._shard_of, self._owners)
+
+        if fleets is None:
+            fleets = np.empty((0, 3), dtype=np.int64)
+        fleets = np.asarray(fleets, dtype=np.int64).reshape(-1, 3)
+        fleet_shards = shard_of[fleets[:, 2]]
+
+        config = {
+            "positions": self._positions.spec,
+            "shard_of": self._shard_of.spec,
+            "owners": self._owners.spec,
+            "bounds": bounds,
+            "num_civs": num_civs,
+            "ship_range": ship_range,
+            "halo_range": ship_range if halo_range is None else halo_range,
+            "make_systems": make_systems,
+        }
+
+        # Shard -> packed fleets waiting to enter it at the next tick
+        self._inboxes: list[list[bytes]] = [[] for _ in range(self.num_shards)]
+        self.stats: list[dict] = []
+
+        self._conns = []
+        self._workers = []
+        for shard in range(self.num_shards):
+            conn, worker_conn = multiprocessing.Pipe()
+            shard_config = dict(config, fleets=fleets[fleet_shards == shard])
+            worker = multiprocessing.Process(
+                target=_run_shard, args=(shard, shard_config, worker_conn), daemon=True
+            )
+            worker.start()
+            self._conns.append(conn)
+            self._workers.append(worker)
+
+        # Wait for every shard to finish starting
+        try:
+            for conn in self._conns:
+                conn.recv()
+        except BaseException:
+            self.close()
+            raise
+
+    def tick(self) -> None:
+        """Run one tick on every shard, then route the fleets that crossed shard
+        borders to their new shards.
+        """
+        for conn, incoming in zip(self._conns, self._inboxes):
+            conn.send((self.current_tick, incoming))
+
+        self._inboxes = [[] for _ in range(self.num_shards)]
+        self.stats = []
+        for conn in self._conns:
+            outgoing, stats = conn.recv()
+            for shard, data in outgoing.items():
+                self._inboxes[shard].append(data)
+            self.stats.append(stats)
+
+        self.current_tick += 1
+
+    def run(self, num_ticks: int) -> None:
+        for _ in range(num_ticks):
+            self.tick()
+
+    @property
+    def owners(self) -> np.ndarray:
+        """The owner (civ + 1, or 0) of every system as of the last tick."""
+        return self._owners.array[self.current_tick % 2]
+
+    def close(self) -> None:
+        if self._shared is None:
+            return
+
+        for conn in self._conns:
+            try:
+                conn.send(None)
+            except OSError:
+                # The worker already died
+                pass
+
+        for worker in self._workers:
+            worker.join(timeout=5)
+            if worker.is_alive():
+                worker.terminate()
+
+        for shared in self._shared:
+            shared.close(unlink=True)
+
+        self._shared = None
+        self._conns = []
+        self._workers = []
+
+    def __enter__(self) -> "ShardedGalaxy":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
@@ -1,13 +1,14 @@
 import os
-import random
 import math
 
 from concurrent.futures import ThreadPoolExecutor, Future
-from typing import Generator
 from dataclasses import dataclass
 from collections import deque
 
 import atomics
+import numpy as np
+
+from seed.common.galaxy import generate_galaxy
 
 NUM_SYSTEMS = 200
 NUM_STARTING_CIVILIZATIONS = 4
@@ -79,26 +80,6 @@ class Simulation:
     fleet_queue = deque()
 
 
-def generate_galaxy(
-    num_systems: int = 200,
-    num_arms: int = 4,
-    arm_spread: float = 0.3,
-    radius: int = 30,
-) -> Generator[tuple[float, float], None, None]:
-
-    # Generate (star) systems
-    for _ in range(num_systems):
-        # Random distance from the center. Maybe have an actual distribution the
-        # distance follows instead of just uniform?
-        r = radius * random.random()
-        arm = random.randrange(num_arms)
-        base_angle = (arm * (2 * math.pi / num_arms)) + (r / radius * 2 * math.pi)
-        angle = base_angle + random.uniform(-arm_spread, arm_spread)
-        x = r * math.cos(angle)
-        y = r * math.sin(angle)
-        yield (x, y)
-
-
 def process_fleets(s: Simulation) -> None:
     """Process fleet arrivals.
     """
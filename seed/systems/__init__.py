@@ -1,14 +1,19 @@
 """Entity Component System (ECS) systems for the simulation."""
 
-from seed.systems.base import System, handle
+from seed.systems.base import System, handle, handle_batch
 from seed.systems.system_system import SystemSystem
 from seed.systems.routing_system import RoutingSystem
+from seed.systems.movement_system import MovementSystem
 from seed.systems.civilization_system import CivilizationSystem
+from seed.systems.scheduler import Scheduler
 
 __all__ = [
     "System",
     "handle",
+    "handle_batch",
     "SystemSystem",
     "RoutingSystem",
+    "MovementSystem",
     "CivilizationSystem",
+    "Scheduler",
 ]
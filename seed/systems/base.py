@@ -16,8 +16,34 @@ def handle(event_type: type[Event], priority: int = 0) -> None:
     return wrapper
 
 
+def handle_batch(event_type: type[Event], priority: int = 0) -> None:
+    """Decorator to mark a method as a batch event handler, which is called with a
+    list of every event of that type once the event queue has been drained.
+
+    Batch handlers always run after every per-event handler, so priority only
+    orders them among other batch handlers.
+    """
+
+    def wrapper(func: callable):
+        func._handled_event_type = event_type
+        func._event_priority = priority
+        func._handles_batches = True
+        return func
+
+    return wrapper
+
+
 class System(ABC):
-    """Base class for all systems in the simulation."""
+    """Base class for all systems in the simulation.
+
+    Subclasses declare the component types their start() and update() read and
+    write, and the systems they must run after. The Scheduler orders systems by
+    these declarations and reports pairs whose accesses conflict.
+    """
+
+    reads: tuple[type, ...] = ()
+    writes: tuple[type, ...] = ()
+    after: tuple[type["System"], ...] = ()
 
     def __init__(self, w: WorldState, event_bus: EventBus):
         self.w = w
@@ -33,8 +59,15 @@ class System(ABC):
         pass
 
     def _register_event_handlers(self) -> None:
-        """Register all methods decorated with @handle as event handlers."""
+        """Register all methods decorated with @handle or @handle_batch as event
+        handlers.
+        """
         for _, method in inspect.getmembers(self, predicate=inspect.ismethod):
             if hasattr(method, "_handled_event_type"):
                 priority = getattr(method, "_event_priority")
-                self.event_bus.subscribe(method._handled_event_type, method, priority)
+                if getattr(method, "_handles_batches", False):
+                    subscribe = self.event_bus.subscribe_batch
+                else:
+                    subscribe = self.event_bus.subscribe
+
+                subscribe(method._handled_event_type, method, priority)
@@ -1,10 +1,14 @@
 import random
 
 from seed.systems.base import System
+from seed.systems.movement_system import MovementSystem
+from seed.systems.routing_system import RoutingSystem
+from seed.systems.system_system import SystemSystem
 from seed.world_state import WorldState
 from seed.common.base_types import (
     CivilizationComponent,
     FleetComponent,
+    HaloComponent,
 )
 from seed.common.events import EventBus, FleetStartedRouteToSystemEvent
 
@@ -12,9 +16,17 @@ from seed.common.events import EventBus, FleetStartedRouteToSystemEvent
 class CivilizationSystem(System):
     """System for managing civilization behaviors and decision-making."""
 
+    reads = (CivilizationComponent, FleetComponent)
+    writes = (FleetComponent,)
+
+    # Civs pick targets from the reachable systems RoutingSystem maintains, and
+    # send out the fleets SystemSystem builds and MovementSystem parks.
+    after = (RoutingSystem, SystemSystem, MovementSystem)
+
     def __init__(self, w: WorldState, event_bus: EventBus):
         super().__init__(w, event_bus)
         self.civs = []
+        self.fleets_by_civ = None
 
     def start(self) -> None:
         # TODO: Recalculate on some NewCivilizationAddedEvent, maybe.
@@ -24,6 +36,8 @@ class CivilizationSystem(System):
         if not self.civs:
             raise RuntimeError("Civ list is empty!")
 
+        self.fleets_by_civ = self.w.index(FleetComponent, "owning_civ")
+
     def update(self) -> None:
         for e_civ, civ in self.civs:
             # Pick a random owned system
@@ -31,14 +45,20 @@ class CivilizationSystem(System):
                 print(f"Civilization {civ} has no owned systems!")
                 continue
 
-            # Pick a random parked fleet
-            parked_fleets = [
-                (e_fleet, fleet)
-                for e_fleet, (fleet,) in self.w.get_components(FleetComponent)
-                if fleet.owning_civ == e_civ and fleet.parked_system
-            ]
+            # Pick a random parked fleet. Fleets at halo systems (see
+            # seed.sharding) are about to cross into the shard that owns them.
+            parked_fleets = []
+            for e_fleet in self.fleets_by_civ[e_civ]:
+                fleet = self.w.get_entity_component(e_fleet, FleetComponent)
+                if fleet.parked_system and not self.w.has_component(
+                    fleet.parked_system, HaloComponent
+                ):
+                    parked_fleets.append((e_fleet, fleet))
 
             print(f"There are {len(parked_fleets)} parked fleets.")
+            if not parked_fleets:
+                continue
+
             e_fleet, fleet = random.choice(parked_fleets)
 
             # Pick a random reachable system
@@ -51,8 +71,11 @@ class CivilizationSystem(System):
 
             # Send the entire fleet to target
             self.event_bus.publish(
-                FleetStartedRouteToSystemEvent(
-                    fleet=e_fleet, source=fleet.parked_system, target=target
+                self.event_bus.acquire(
+                    FleetStartedRouteToSystemEvent,
+                    fleet=e_fleet,
+                    source=fleet.parked_system,
+                    target=target,
                 )
             )
 
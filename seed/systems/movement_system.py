@@ -0,0 +1,206 @@
+import numpy as np
+
+from seed.systems.base import System, handle_batch
+from seed.systems.routing_system import RoutingSystem
+from seed.systems.system_system import SystemSystem
+from seed.world_state import WorldState
+from seed.common.base_types import Entity, SystemComponent, FleetComponent
+from seed.common.events import (
+    EventBus,
+    FleetStartedRouteToSystemEvent,
+    FleetArrivedAtSystemEvent,
+)
+
+
+class MovementSystem(System):
+    """System for moving fleets along their routes, hop by hop.
+
+    In-flight fleets are kept in parallel arrays: the fleet, the position in a
+    shared hops array of the system it is flying to, the end of its route in that
+    array, and the tick it reaches its next system. Every update advances all the
+    fleets that are due at once, and the fleets that reached the end of their
+    route are parked and announced with one FleetArrivedAtSystemEvent each, all
+    published together.
+    """
+
+    reads = (SystemComponent,)
+    writes = (FleetComponent,)
+    after = (SystemSystem,)
+
+    def __init__(
+        self,
+        w: WorldState,
+        event_bus: EventBus,
+        routing: RoutingSystem,
+        speed: float = 1.0,
+    ):
+        super().__init__(w, event_bus)
+        self.routing = routing
+
+        # Distance a fleet covers per tick
+        self.speed = speed
+
+        # In-flight fleets, the first self.size entries of each array
+        self.size = 0
+        self.fleets = np.zeros(64, dtype=np.int64)
+        self.hop = np.zeros(64, dtype=np.int64)  # index into hops
+        self.end = np.zeros(64, dtype=np.int64)  # one past the last hop
+        self.arrival = np.zeros(64, dtype=np.int64)  # tick hops[hop] is reached
+
+        # Routes of all in-flight fleets, as system indices, back to back. A
+        # fleet's hops[hop - 1] is the system it last left.
+        self.hops = np.zeros(1024, dtype=np.int64)
+        self.hops_used = 0
+
+        self.arrived = 0  # fleets that reached their target in the last update
+
+    def __len__(self) -> int:
+        return self.size
+
+    def _leg_ticks(self, start: np.ndarray, stop: np.ndarray) -> np.ndarray:
+        positions = self.routing.grid.positions
+        delta = positions[stop] - positions[start]
+        distance = np.hypot(delta[:, 0], delta[:, 1])
+        return np.maximum(np.ceil(distance / self.speed), 1).astype(np.int64)
+
+    def _reserve(self, num_fleets: int, num_hops: int) -> None:
+        """Make room for num_fleets more fleets with num_hops hops between them."""
+        needed = self.size + num_fleets
+        if needed > len(self.fleets):
+            capacity = max(needed, 2 * len(self.fleets))
+            for name in ("fleets", "hop", "end", "arrival"):
+                grown = np.zeros(capacity, dtype=np.int64)
+                grown[: self.size] = getattr(self, name)[: self.size]
+                setattr(self, name, grown)
+
+        if self.hops_used + num_hops <= len(self.hops):
+            return
+
+        # Drop the hops fleets have already flown, keeping the one each fleet last
+        # left. Fleet i's remaining hops [hop[i] - 1, end[i]) move to new_start[i].
+        n = self.size
+        start = self.hop[:n] - 1
+        lengths = self.end[:n] - start
+        new_start = np.cumsum(lengths) - lengths
+        kept = np.repeat(start - new_start, lengths) + np.arange(lengths.sum())
+
+        # Only grow when the kept hops would fill more than half of the buffer, so
+        # that it stops growing once flown hops are dropped as fast as they're added
+        used = int(lengths.sum())
+        capacity = len(self.hops)
+        while 2 * (used + num_hops) > capacity:
+            capacity *= 2
+
+        hops = np.zeros(capacity, dtype=np.int64)
+        hops[:used] = self.hops[kept]
+
+        self.hops = hops
+        self.hops_used = used
+        self.hop[:n] = new_start + 1
+        self.end[:n] = new_start + lengths
+
+    def depart(self, fleets: list[Entity], routes: list[list[int]]) -> None:
+        """Start moving fleets along routes, each a list of system indices starting
+        with the system the fleet leaves from.
+        """
+        moving = [(f, route) for f, route in zip(fleets, routes) if len(route) > 1]
+        if not moving:
+            return
+
+        fleets = [f for f, _ in moving]
+        routes = [route for _, route in moving]
+        lengths = np.array([len(route) for route in routes], dtype=np.int64)
+        self._reserve(len(fleets), int(lengths.sum()))
+
+        start = self.hops_used + np.cumsum(lengths) - lengths
+        self.hops[self.hops_used : self.hops_used + lengths.sum()] = np.concatenate(
+            routes
+        )
+        self.hops_used += int(lengths.sum())
+
+        new = slice(self.size, self.size + len(fleets))
+        self.fleets[new] = fleets
+        self.hop[new] = start + 1
+        self.end[new] = start + lengths
+        self.arrival[new] = self.event_bus.current_tick + self._leg_ticks(
+            self.hops[start], self.hops[start + 1]
+        )
+        self.size += len(fleets)
+
+    def update(self) -> None:
+        now = self.event_bus.current_tick
+        arrived_fleets = []
+        arrived_systems = []
+
+        # A fleet can fly several one-tick legs in a single update if updates
+        # were skipped, so keep going until nothing is due.
+        while self.size:
+            n = self.size
+            due = np.flatnonzero(self.arrival[:n] <= now)
+            if not len(due):
+                break
+
+            hop = self.hop[due] + 1
+            done = hop >= self.end[due]
+
+            moving = due[~done]
+            next_hop = hop[~done]
+            self.hop[moving] = next_hop
+            self.arrival[moving] += self._leg_ticks(
+                self.hops[next_hop - 1], self.hops[next_hop]
+            )
+
+            finished = due[done]
+            arrived_fleets.extend(self.fleets[finished].tolist())
+            arrived_systems.extend(self.hops[self.hop[finished]].tolist())
+
+            keep = np.ones(n, dtype=bool)
+            keep[finished] = False
+            kept = int(keep.sum())
+            for name in ("fleets", "hop", "end", "arrival"):
+                array = getattr(self, name)
+                array[:kept] = array[:n][keep]
+
+            self.size = kept
+
+        self.arrived = len(arrived_fleets)
+        self._park(arrived_fleets, arrived_systems)
+
+    def _park(self, fleets: list[Entity], system_indices: list[int]) -> None:
+        systems = self.routing.systems
+        for e_fleet, i in zip(fleets, system_indices):
+            # The fleet may have been destroyed on the way
+            if not self.w.has_entity(e_fleet):
+                continue
+
+            e_sys = systems[i][0]
+            self.w.get_entity_component(e_fleet, FleetComponent).parked_system = e_sys
+            self.event_bus.publish(
+                self.event_bus.acquire(
+                    FleetArrivedAtSystemEvent, fleet=e_fleet, system=e_sys
+                )
+            )
+
+    # Event handlers
+    @handle_batch(FleetStartedRouteToSystemEvent, priority=10)
+    def on_fleets_started_route(
+        self, events: list[FleetStartedRouteToSystemEvent]
+    ) -> None:
+        # Runs after RoutingSystem has found the routes
+        system_index = self.routing.system_index
+        fleets = []
+        routes = []
+        for event in events:
+            edges = self.routing.fleet_routes.pop(event.fleet, None)
+            if not edges:
+                # No route (or already there): the fleet stays where it was
+                fleet = self.w.get_entity_component(event.fleet, FleetComponent)
+                fleet.parked_system = event.source
+                continue
+
+            fleets.append(event.fleet)
+            routes.append(
+                [system_index[edges[0][0]]] + [system_index[b] for _, b in edges]
+            )
+
+        self.depart(fleets, routes)
@@ -1,11 +1,21 @@
-from heapq import heappush, heappop
-from functools import cache
-from typing import Generator
-from collections import deque
-import math
+from collections import defaultdict
+import os
 
-from seed.systems.base import System, handle
+import numpy as np
+
+from seed.systems.base import System, handle_batch
 from seed.world_state import WorldState
+from seed.common.spatial import SpatialGrid
+from seed.common.graph import (
+    CSRGraph,
+    RouteCache,
+    astar,
+    shortest_path_tree,
+    tree_path,
+)
+from seed.common.all_pairs import AllPairsTable
+from seed.common.distances import DistanceMatrix
+from seed.common.hierarchical import HierarchicalRouter
 from seed.common.base_types import (
     Entity,
     SystemComponent,
@@ -22,14 +32,102 @@ from seed.common.events import (
 class RoutingSystem(System):
     """System for pathfinding and route management between star systems."""
 
-    def __init__(self, w: WorldState, event_bus: EventBus):
+    reads = (SystemComponent, CivilizationComponent)
+    writes = (CivilizationComponent,)
+
+    def __init__(
+        self,
+        w: WorldState,
+        event_bus: EventBus,
+        route_cache_size: int = 4096,
+        all_pairs_max_systems: int = 0,
+        all_pairs_workers: int = 0,
+        all_pairs_dir: str | None = None,
+        hierarchical_min_systems: int = 0,
+        hierarchical_cluster_ranges: float = 8,
+        hierarchical_portal_spacing: float = 1,
+        hierarchical_epsilon: float = 0.0,
+        hierarchical_max_stretch: float | None = 1.2,
+        batch_routing: bool = False,
+        dense_distance_max_systems: int = 4096,
+    ):
+        """
+        all_pairs_max_systems: precompute all-pairs shortest path tables for every
+            ship range when the galaxy has at most this many systems (0 disables).
+            Larger galaxies route with on-demand A* search.
+        all_pairs_workers: number of processes used to build the tables.
+        all_pairs_dir: directory the tables are saved to and loaded from.
+        hierarchical_min_systems: route with a HierarchicalRouter when the galaxy has
+            at least this many systems (0 disables).
+        hierarchical_cluster_ranges: width of a hierarchical cluster, in ship ranges.
+        hierarchical_portal_spacing: spacing between entrances along cluster borders,
+            in ship ranges. 0 keeps every entrance and makes routes optimal; with a
+            larger spacing routes are faster to find but are only bounded against
+            the optimal route by hierarchical_max_stretch.
+        hierarchical_epsilon: weight on the hierarchical search heuristic. Routes
+            are at most (1 + epsilon) times longer than the best abstract route.
+        hierarchical_max_stretch: hierarchical routes longer than this many times a
+            lower bound on the optimal route are replaced by a flat A* search, so
+            no route is more than this many times longer than optimal. None
+            disables the check and the bound.
+        batch_routing: answer the routes requested by every
+            FleetStartedRouteToSystemEvent in a dispatch together, with one
+            shortest path tree per shared source or target instead of one A* per
+            fleet.
+        dense_distance_max_systems: precompute every pairwise system distance when
+            the galaxy has at most this many systems. Larger galaxies compute
+            distances in blocks of rows as they are needed.
+        """
         super().__init__(w, event_bus)
         self.systems = []
-        self.fleet_queue = []
+
+        # Systems are addressed by their dense index into self.systems in the
+        # routing graphs.
+        self.system_index = {}
+        self.positions = []
+
+        # Spatial index over system positions, with cells as wide as the largest
+        # ship range so a neighbor query touches at most 3x3 cells.
+        self.grid = None
 
         # Caches
-        self.systems_reachable_by_hop = {}
-        self.system_distances = {}
+        self.graphs: dict[int, CSRGraph] = {}  # ship range -> adjacency
+        self.dense_distance_max_systems = dense_distance_max_systems
+        self.distances: DistanceMatrix | None = None  # built on first use
+        self.route_cache = RouteCache(route_cache_size)
+
+        self.all_pairs_max_systems = all_pairs_max_systems
+        self.all_pairs_workers = all_pairs_workers
+        self.all_pairs_dir = all_pairs_dir
+        self.all_pairs: dict[int, AllPairsTable] = {}  # ship range -> tables
+
+        self.hierarchical_min_systems = hierarchical_min_systems
+        self.hierarchical_cluster_ranges = hierarchical_cluster_ranges
+        self.hierarchical_portal_spacing = hierarchical_portal_spacing
+        self.hierarchical_epsilon = hierarchical_epsilon
+        self.hierarchical_max_stretch = hierarchical_max_stretch
+        self.routers: dict[int, HierarchicalRouter] = {}  # ship range -> router
+
+        self.batch_routing = batch_routing
+        self.pending_routes: list[tuple[Entity, Entity, Entity]] = []
+
+        # Fleet -> route it was last sent on, as a list of (system, system) edges
+        self.fleet_routes: dict[Entity, list[tuple[Entity, Entity]]] = {}
+
+        # Civ -> number of systems the civ owns within its ship range of each system,
+        # indexed like self.systems. A system is reachable for a civ when its count
+        # is positive and the civ doesn't own it.
+        self.owned_neighbor_counts: dict[Entity, list[int]] = {}
+
+        # Civ -> (ship range, owned systems) the civ's counts were built for. Owner
+        # changes are applied by comparing against this, so a change the counts
+        # already include (e.g. one queued before start()) isn't applied twice.
+        self.counted_ranges: dict[Entity, int] = {}
+        self.counted_systems: dict[Entity, set[Entity]] = {}
+
+        # Civ -> system -> position of the system in civ.reachable_systems, so a
+        # system can be swap-removed from that list in O(1).
+        self.reachable_positions: dict[Entity, dict[Entity, int]] = {}
 
     def start(self) -> None:
         # The number of system entities won't change, so there's no point in
@@ -37,113 +135,363 @@ class RoutingSystem(System):
         self.systems = [
             (entity, sys) for entity, (sys,) in self.w.get_components(SystemComponent)
         ]
+        self.system_index = {entity: i for i, (entity, _) in enumerate(self.systems)}
+        self.positions = [sys.position for _, sys in self.systems]
+
+        ship_ranges = {
+            civ.ship_range
+            for _, (civ,) in self.w.get_components(CivilizationComponent)
+        }
+        self.grid = SpatialGrid(self.positions, max(ship_ranges, default=8))
+        self.distances = None
 
-        # HACK: Warm up cache for each civ's reachable systems. Requires that
-        # RoutingSystem runs before CivilizationSystem
+        # Build the graph for every ship range in use up front. Ranges that show up
+        # later are built the first time they are needed.
+        self.graphs = {}
+        self.all_pairs = {}
+        self.routers = {}
+        for ship_range in ship_ranges:
+            self.get_graph(ship_range)
+            self.get_all_pairs(ship_range)
+            self.get_hierarchical_router(ship_range)
+
+        # Build each civ's reachable systems up front. CivilizationSystem reads
+        # them, so it is scheduled after this system.
+        self.owned_neighbor_counts = {}
+        self.counted_ranges = {}
+        self.counted_systems = {}
+        self.reachable_positions = {}
         for e_civ, _ in self.w.get_components(CivilizationComponent):
             self.get_civ_reachable_systems(e_civ)
 
     def update(self) -> None:
-        pass
+        # Counts built for an old ship range don't match the civ's graph anymore.
+        # There are few civs, so checking them all is cheaper than tracking which
+        # ones changed, and it also catches changes made earlier in this tick.
+        for e_civ, (civ,) in self.w.get_components(CivilizationComponent):
+            if civ.ship_range != self.counted_ranges.get(e_civ, civ.ship_range):
+                self.rebuild_civ_reachable_systems(e_civ)
+
+    def get_graph(self, ship_range: int) -> CSRGraph:
+        """Return the graph connecting every pair of systems within ship_range."""
+        graph = self.graphs.get(ship_range)
+        if graph is None:
+            graph = CSRGraph.within_range(self.grid, ship_range)
+            self.graphs[ship_range] = graph
+
+        return graph
+
+    def get_all_pairs(self, ship_range: int) -> AllPairsTable | None:
+        """Return the all-pairs tables for ship_range, or None if the galaxy is too
+        big for them.
+        """
+        if not 0 < len(self.systems) <= self.all_pairs_max_systems:
+            return None
+
+        table = self.all_pairs.get(ship_range)
+        if table is None:
+            path = None
+            if self.all_pairs_dir:
+                path = os.path.join(self.all_pairs_dir, f"all_pairs_{ship_range}.npz")
+
+            table = AllPairsTable.load_or_build(
+                path, self.get_graph(ship_range), self.all_pairs_workers
+            )
+            self.all_pairs[ship_range] = table
+
+        return table
+
+    def get_hierarchical_router(self, ship_range: int) -> HierarchicalRouter | None:
+        """Return the hierarchical router for ship_range, or None if the galaxy is
+        too small to need one.
+        """
+        if not 0 < self.hierarchical_min_systems <= len(self.systems):
+            return None
+
+        router = self.routers.get(ship_range)
+        if router is None:
+            router = HierarchicalRouter(
+                self.get_graph(ship_range),
+                self.positions,
+                self.hierarchical_cluster_ranges * ship_range,
+                self.hierarchical_portal_spacing * ship_range,
+                self.hierarchical_epsilon,
+                self.hierarchical_max_stretch,
+            )
+            self.routers[ship_range] = router
+
+        return router
+
+    def get_distance_matrix(self) -> DistanceMatrix:
+        """Return the distances between every pair of systems. Routing itself
+        doesn't need them, so the matrix is only built the first time it's asked for.
+        """
+        if self.distances is None:
+            self.distances = DistanceMatrix(
+                self.grid.positions, self.dense_distance_max_systems
+            )
+
+        return self.distances
 
-    @cache
     def get_distance(self, e_sys1: Entity, e_sys2: Entity) -> float:
         """Return the distance between two systems."""
-        x1, y1 = self.w.get_entity_component(e_sys1, SystemComponent).position
-        x2, y2 = self.w.get_entity_component(e_sys2, SystemComponent).position
-        return math.hypot(x1 - x2, y1 - y2)
+        return self.get_distance_matrix().distance(
+            self.system_index[e_sys1], self.system_index[e_sys2]
+        )
 
-    @cache
     def get_reachable_neighbors(
         self, e_sys: Entity, ship_range: int
-    ) -> Generator[tuple[Entity, SystemComponent], None, None]:
-        """Given a ship range and a system, return the systems that are immediately
-        reachable from the source system.
+    ) -> tuple[tuple[Entity, SystemComponent], ...]:
+        """Given a ship range and a system, return the other systems that are
+        immediately reachable from the source system.
         """
-        computed = set()
-        for e_sys_other, sys_component in self.systems:
-            if (
-                self.get_distance(e_sys, e_sys_other) <= ship_range
-                and e_sys_other not in computed
-            ):
-                computed.add(e_sys_other)
-                yield (e_sys_other, sys_component)
+        graph = self.get_graph(ship_range)
+        i = self.system_index[e_sys]
+        offsets = graph.offsets_list
+        return tuple(
+            self.systems[j] for j in graph.neighbors_list[offsets[i] : offsets[i + 1]]
+        )
 
     def get_civ_reachable_systems(self, civ_entity: Entity) -> list[Entity]:
+        """Return the systems a civ doesn't own that are within its ship range of a
+        system it does. The list is kept up to date as ownership changes.
+        """
+        civ = self.w.get_entity_component(civ_entity, CivilizationComponent)
+        if self.counted_ranges.get(civ_entity) != civ.ship_range:
+            self.rebuild_civ_reachable_systems(civ_entity)
+
+        return civ.reachable_systems
+
+    def rebuild_civ_reachable_systems(self, civ_entity: Entity) -> None:
+        """Recount a civ's owned neighbors from scratch. Done automatically when
+        the civ's ship range changes.
+        """
         civ = self.w.get_entity_component(civ_entity, CivilizationComponent)
+        graph = self.get_graph(civ.ship_range)
+        self.counted_ranges[civ_entity] = civ.ship_range
+        self.counted_systems[civ_entity] = set(civ.owned_systems)
 
-        # Cache is still valid
-        if civ.reachable_systems:
-            return civ.reachable_systems
+        neighbors = [
+            graph.neighbors_of(self.system_index[e_sys]) for e_sys in civ.owned_systems
+        ]
+        counts = np.bincount(
+            np.concatenate(neighbors) if neighbors else np.empty(0, dtype=np.int64),
+            minlength=len(self.systems),
+        )
+        self.owned_neighbor_counts[civ_entity] = counts.tolist()
 
-        # Cache has been invalidated
         civ.reachable_systems = [
-            entity
-            for owned_system in civ.owned_systems
-            for entity, system in self.get_reachable_neighbors(
-                owned_system, civ.ship_range
-            )
-            if system.owning_civ != civ_entity
+            self.systems[j][0]
+            for j in np.flatnonzero(counts).tolist()
+            if self.systems[j][1].owning_civ != civ_entity
         ]
-        return civ.reachable_systems
+        self.reachable_positions[civ_entity] = {
+            e_sys: k for k, e_sys in enumerate(civ.reachable_systems)
+        }
 
-    def get_route(self, fleet, source, target):
-        def heuristic(system: Entity) -> float:
-            return self.get_distance(system, target)
+    def _add_reachable(self, civ: CivilizationComponent, civ_entity: Entity, j: int):
+        positions = self.reachable_positions[civ_entity]
+        e_sys = self.systems[j][0]
+        if e_sys not in positions:
+            positions[e_sys] = len(civ.reachable_systems)
+            civ.reachable_systems.append(e_sys)
+
+    def _remove_reachable(self, civ: CivilizationComponent, civ_entity: Entity, j: int):
+        positions = self.reachable_positions[civ_entity]
+        k = positions.pop(self.systems[j][0], None)
+        if k is None:
+            return
+
+        # Swap-remove
+        last = civ.reachable_systems.pop()
+        if k < len(civ.reachable_systems):
+            civ.reachable_systems[k] = last
+            positions[last] = k
+
+    def _update_reachable(self, civ_entity: Entity, e_sys: Entity):
+        """Bring a civ's counts up to date with whether it owns e_sys now. Only
+        that system and its neighbors can change reachability.
+        """
+        counted = self.counted_systems.get(civ_entity)
+        if counted is None:
+            # Not tracked yet; it will be built from the current state when needed
+            return
+
+        civ = self.w.get_entity_component(civ_entity, CivilizationComponent)
+        if civ.ship_range != self.counted_ranges[civ_entity]:
+            self.rebuild_civ_reachable_systems(civ_entity)
+            return
+
+        i = self.system_index[e_sys]
+        gained = self.systems[i][1].owning_civ == civ_entity
+        if gained == (e_sys in counted):
+            # The counts already include this change
+            return
+
+        if gained:
+            counted.add(e_sys)
+        else:
+            counted.discard(e_sys)
+
+        counts = self.owned_neighbor_counts[civ_entity]
+        graph = self.get_graph(civ.ship_range)
+        offsets = graph.offsets_list
+        delta = 1 if gained else -1
+
+        for j in graph.neighbors_list[offsets[i] : offsets[i + 1]]:
+            counts[j] += delta
+            if counts[j] == 0:
+                self._remove_reachable(civ, civ_entity, j)
+            elif gained and counts[j] == 1:
+                if self.systems[j][1].owning_civ != civ_entity:
+                    self._add_reachable(civ, civ_entity, j)
+
+        # The system itself
+        if gained:
+            self._remove_reachable(civ, civ_entity, i)
+        elif counts[i] > 0:
+            self._add_reachable(civ, civ_entity, i)
+
+    def find_path(self, ship_range: int, source: int, target: int) -> list[int]:
+        """Return the shortest path from source to target as a list of system
+        indices, or an empty list if target can't be reached.
+        """
+        return astar(self.get_graph(ship_range), self.positions, source, target)
+
+    def get_cached_path(
+        self, ship_range: int, source: int, target: int
+    ) -> tuple[int, ...]:
+        """Like find_path, but served from the all-pairs tables or the route cache
+        when possible.
+        """
+        table = self.get_all_pairs(ship_range)
+        if table is not None:
+            return tuple(table.path(source, target))
+
+        version = self.get_graph(ship_range).version
+        key = (ship_range, source, target)
 
+        path = self.route_cache.get(key, version)
+        if path is None:
+            router = self.get_hierarchical_router(ship_range)
+            if router is not None:
+                path = tuple(router.find_path(source, target))
+            else:
+                path = tuple(self.find_path(ship_range, source, target))
+
+            self.route_cache.put(key, version, path)
+
+        return path
+
+    def get_route(self, fleet, source, target):
         e_civ = self.w.get_entity_component(fleet, FleetComponent).owning_civ
         civ = self.w.get_entity_component(e_civ, CivilizationComponent)
-        dist = {entity: float("inf") for entity, _ in self.systems}
-        previous = {entity: None for entity, _ in self.systems}
-        dist[source] = 0
-
-        heap = [(0 + heuristic(source), 0, source)]  # (priority, distance, system)
-
-        while heap:
-            _, current_dist, current = heappop(heap)
-            if current == target:
-                break
-            if current_dist > dist[current]:
-                continue
-            for neighbor in self.get_reachable_neighbors(current, civ.ship_range):
-                weight = current_dist + self.get_distance(current, neighbor)
-                if weight < dist[neighbor]:
-                    dist[neighbor] = weight
-                    previous[neighbor] = current
-                    heappush(heap, (weight + heuristic(neighbor), weight, neighbor))
-
-        # Reconstruct the path
-        path_nodes = deque()
-        curr = target
-        while curr is not None:
-            path_nodes.appendleft(curr)
-            curr = previous[curr]
-
-        path_nodes = list(path_nodes)
+
+        path = self.get_cached_path(
+            civ.ship_range, self.system_index[source], self.system_index[target]
+        )
+        return self._path_to_edges(path)
+
+    def _path_to_edges(self, path) -> list[tuple[Entity, Entity]]:
+        path_nodes = [self.systems[i][0] for i in path]
         edges = [(path_nodes[i], path_nodes[i + 1]) for i in range(len(path_nodes) - 1)]
         return edges
 
-    # Event handlers
-    @handle(SystemOwnerChangedEvent, priority=-100)
-    def on_system_owner_changed(self, event: SystemOwnerChangedEvent) -> None:
-        system = event.system
-        old_owner = event.old_owner
-        new_owner = event.new_owner
-
-        # Invalidate caches for both the old owner and the new, since both of their
-        # owned system sets changed.
-        if old_owner:
-            old_owner_civ = self.w.get_entity_component(
-                old_owner, CivilizationComponent
+    def resolve_pending_routes(self) -> None:
+        """Answer every route requested since the last call in one batch.
+
+        Requests are grouped per ship range. Within a range, either every distinct
+        source or every distinct target with routes to more than one system gets
+        one Dijkstra tree, whichever needs fewer trees. Since range graphs are
+        undirected, a tree grown from a target gives the routes into it when
+        reversed. Routes that share nothing go through get_cached_path.
+        """
+        requests = self.pending_routes
+        self.pending_routes = []
+
+        by_range = defaultdict(list)
+        for fleet, source, target in requests:
+            e_civ = self.w.get_entity_component(fleet, FleetComponent).owning_civ
+            civ = self.w.get_entity_component(e_civ, CivilizationComponent)
+            by_range[civ.ship_range].append(
+                (fleet, self.system_index[source], self.system_index[target])
             )
-            old_owner_civ.reachable_systems = self.get_civ_reachable_systems(old_owner)
 
-        if new_owner:
-            new_owner_civ = self.w.get_entity_component(
-                new_owner, CivilizationComponent
+        for ship_range, range_requests in by_range.items():
+            table = self.get_all_pairs(ship_range)
+            graph = self.get_graph(ship_range)
+
+            # (fleet, source, target) grouped by the root of their tree
+            groups = defaultdict(list)
+            forward = len({s for _, s, _ in range_requests}) <= len(
+                {t for _, _, t in range_requests}
             )
-            new_owner_civ.reachable_systems = self.get_civ_reachable_systems(new_owner)
+            for fleet, source, target in range_requests:
+                if table is not None:
+                    path = table.path(source, target)
+                else:
+                    key = (ship_range, source, target)
+                    path = self.route_cache.get(key, graph.version)
+                    if path is None:
+                        groups[source if forward else target].append(
+                            (fleet, source, target)
+                        )
+                        continue
+
+                self.fleet_routes[fleet] = self._path_to_edges(path)
+
+            for root, group in groups.items():
+                ends = {target if forward else source for _, source, target in group}
+                if len(ends) == 1:
+                    # Nothing to share: one search (hierarchical if enabled) does
+                    # it, and caches the route
+                    _, source, target = group[0]
+                    path = self.get_cached_path(ship_range, source, target)
+                    for fleet, _, _ in group:
+                        self.fleet_routes[fleet] = self._path_to_edges(path)
+                    continue
+
+                previous = shortest_path_tree(graph, root, ends)
+                for fleet, source, target in group:
+                    if forward:
+                        path = tree_path(previous, target)
+                    else:
+                        path = tree_path(previous, source)[::-1]
+
+                    self.route_cache.put(
+                        (ship_range, source, target), graph.version, tuple(path)
+                    )
+                    self.fleet_routes[fleet] = self._path_to_edges(path)
 
-    @handle(FleetStartedRouteToSystemEvent)
-    def on_fleet_started_route(self, event: FleetStartedRouteToSystemEvent) -> None:
-        self.get_route(event.fleet, event.source, event.target)
+    # Event handlers
+    @handle_batch(SystemOwnerChangedEvent)
+    def on_systems_owner_changed(self, events: list[SystemOwnerChangedEvent]) -> None:
+        # Both the old owner's and the new owner's reachable systems change, but
+        # only around the systems that flipped. Each (civ, system) pair is checked
+        # once against the current owner, so a system that left and rejoined a civ
+        # within the batch cancels out.
+        changes = {}  # (civ, system) -> None, in event order
+        for event in events:
+            if event.old_owner:
+                changes[event.old_owner, event.system] = None
+            if event.new_owner:
+                changes[event.new_owner, event.system] = None
+
+        for civ, system in changes:
+            if self.w.has_entity(civ):
+                self._update_reachable(civ, system)
+
+    @handle_batch(FleetStartedRouteToSystemEvent)
+    def on_fleets_started_route(
+        self, events: list[FleetStartedRouteToSystemEvent]
+    ) -> None:
+        if self.batch_routing:
+            self.pending_routes.extend(
+                (event.fleet, event.source, event.target) for event in events
+            )
+            self.resolve_pending_routes()
+        else:
+            for event in events:
+                self.fleet_routes[event.fleet] = self.get_route(
+                    event.fleet, event.source, event.target
+                )
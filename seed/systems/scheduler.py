@@ -0,0 +1,284 @@
+from concurrent.futures import ThreadPoolExecutor, wait
+import copy
+import random
+import time
+
+import numpy as np
+
+from seed.systems.base import System
+from seed.world_state import WorldState
+from seed.common.events import EventBus
+
+
+class Scheduler:
+    """Runs the simulation's systems in dependency order, one tick at a time,
+    optionally running independent systems on a thread pool.
+    """
+
+    def __init__(
+        self,
+        w: WorldState,
+        event_bus: EventBus,
+        systems: list[System],
+        strict: bool = False,
+        workers: int = 0,
+        check_determinism: bool = False,
+    ):
+        self.w = w
+        self.event_bus = event_bus
+        self.systems = self._order(systems)
+
+        # (system, system, component types) for every pair of systems where one
+        # writes a type the other reads or writes, and the ones whose order isn't
+        # declared through after. The outcome of those depends on registration
+        # order alone, so strict makes them an error.
+        self.conflicts = self._find_conflicts()
+        self.ambiguities = [
+            (a, b, types)
+            for a, b, types in self.conflicts
+            if not self._runs_before(a, b) and not self._runs_before(b, a)
+        ]
+        if strict and self.ambiguities:
+            pairs = ", ".join(
+                f"{type(a).__name__}/{type(b).__name__} "
+                f"({', '.join(t.__name__ for t in types)})"
+                for a, b, types in self.ambiguities
+            )
+            raise ValueError(
+                f"Systems with conflicting accesses aren't ordered: {pairs}"
+            )
+
+        self.stages = self._find_stages()
+        self.check_determinism = check_determinism
+        # The systems of a stage update concurrently (in parallel only on
+        # free-threaded CPython). Their events are buffered per thread and queued in
+        # schedule order, so dispatch sees the same events as a sequential tick.
+        self._pool = ThreadPoolExecutor(workers) if workers > 1 else None
+
+        # Wall time of every system's update() in the last tick, plus "dispatch"
+        self.timings: dict[str, float] = {}
+        self.total_timings: dict[str, float] = {}
+        self.ticks = 0
+
+    @staticmethod
+    def _order(systems: list[System]) -> list[System]:
+        """Topologically sort systems by their after declarations, keeping
+        registration order between systems that don't depend on each other.
+        """
+        # System -> systems it has to wait for
+        waits_for = {
+            system: {
+                other
+                for other in systems
+                if other is not system and isinstance(other, system.after)
+            }
+            for system in systems
+        }
+
+        ordered = []
+        remaining = list(systems)
+        while remaining:
+            ready = next(
+                (s for s in remaining if not waits_for[s] - set(ordered)), None
+            )
+            if ready is None:
+                names = ", ".join(type(s).__name__ for s in remaining)
+                raise ValueError(f"Cyclic system dependencies between {names}")
+
+            ordered.append(ready)
+            remaining.remove(ready)
+
+        return ordered
+
+    def _runs_before(self, a: System, b: System) -> bool:
+        """Return whether b has to wait for a, directly or through other systems."""
+        pending = [b]
+        seen = set()
+        while pending:
+            system = pending.pop()
+            for other in self.systems:
+                if other in seen or not isinstance(other, system.after):
+                    continue
+                if other is a:
+                    return True
+
+                seen.add(other)
+                pending.append(other)
+
+        return False
+
+    def _find_conflicts(self) -> list[tuple[System, System, set[type]]]:
+        conflicts = []
+        for i, a in enumerate(self.systems):
+            for b in self.systems[i + 1 :]:
+                types = (
+                    set(a.writes) & (set(b.reads) | set(b.writes))
+                    | set(b.writes) & set(a.reads)
+                )
+                if types:
+                    conflicts.append((a, b, types))
+
+        return conflicts
+
+    def _find_stages(self) -> list[list[System]]:
+        # A system goes in the stage after the last one it runs after or conflicts
+        # with
+        conflicting = {frozenset((a, b)) for a, b, _ in self.conflicts}
+
+        stage_of = {}
+        for i, system in enumerate(self.systems):
+            stage_of[system] = max(
+                (
+                    stage_of[other] + 1
+                    for other in self.systems[:i]
+                    if isinstance(other, system.after)
+                    or frozenset((other, system)) in conflicting
+                ),
+                default=0,
+            )
+
+        stages = [[] for _ in range(max(stage_of.values(), default=-1) + 1)]
+        for system in self.systems:
+            stages[stage_of[system]].append(system)
+
+        return stages
+
+    def close(self) -> None:
+        """Shut down the thread pool, if there is one."""
+        if self._pool is not None:
+            self._pool.shutdown()
+            self._pool = None
+
+    def start(self) -> None:
+        for system in self.systems:
+            system.start()
+
+        # Every system has subscribed by now
+        self.event_bus.freeze()
+        self.event_bus.dispatch()
+
+    def tick(self) -> None:
+        """Update every system, deliver the events they published, then move the
+        world and the event bus to the next tick.
+        """
+        timings = {}
+        for stage in self.stages:
+            if self.check_determinism and len(stage) > 1:
+                self._update_checked(stage, timings)
+            elif self._pool is None or len(stage) == 1:
+                for system in stage:
+                    self._update(system, timings)
+            else:
+                self._update_parallel(stage, timings)
+
+        start = time.perf_counter()
+        self.event_bus.dispatch()
+        timings["dispatch"] = time.perf_counter() - start
+
+        self.w.end_tick()
+        self.event_bus.advance_time()
+        self._record(timings)
+
+    def _update(self, system: System, timings: dict[str, float]) -> None:
+        start = time.perf_counter()
+        system.update()
+        timings[type(system).__name__] = time.perf_counter() - start
+
+    def _update_buffered(self, system: System) -> tuple[float, list]:
+        with self.event_bus.thread_buffer() as buffer:
+            start = time.perf_counter()
+            system.update()
+            return time.perf_counter() - start, buffer
+
+    def _update_parallel(self, stage: list[System], timings: dict[str, float]):
+        self.event_bus.begin_buffering()
+        futures = []
+        try:
+            futures = [self._pool.submit(self._update_buffered, s) for s in stage]
+            wait(futures)
+        finally:
+            self.event_bus.end_buffering(
+                [f.result()[1] for f in futures if f.exception() is None]
+            )
+
+        for system, future in zip(stage, futures):
+            elapsed, _ = future.result()
+            timings[type(system).__name__] = elapsed
+
+    def _update_checked(self, stage: list[System], timings: dict[str, float]):
+        # Parallel stages rely on their outcome not depending on the order their
+        # systems run in. Run the stage in reverse on a copy of everything, then
+        # for real, and compare the worlds and the events each system published.
+        # Copying the whole simulation every stage makes this slow.
+
+        # Shared random generators have to produce the same numbers in both runs
+        rng_states = random.getstate(), np.random.get_state()
+
+        w, event_bus, systems = copy.deepcopy((self.w, self.event_bus, stage))
+        reverse_events = self._run_buffered(event_bus, reversed(systems))[::-1]
+        reverse_world = w.snapshot()
+
+        random.setstate(rng_states[0])
+        np.random.set_state(rng_states[1])
+        events = self._run_buffered(self.event_bus, stage, timings)
+        world = self.w.snapshot()
+
+        differences = [
+            f"events published by {type(system).__name__}"
+            for system, ours, theirs in zip(stage, events, reverse_events)
+            if ours != theirs
+        ]
+        for entity in world.keys() | reverse_world.keys():
+            ours, theirs = world.get(entity, {}), reverse_world.get(entity, {})
+            for comp_type in ours.keys() | theirs.keys():
+                if ours.get(comp_type) != theirs.get(comp_type):
+                    differences.append(f"{comp_type.__name__} of entity {entity}")
+
+        if differences:
+            names = ", ".join(type(s).__name__ for s in stage)
+            shown = "; ".join(sorted(differences)[:5])
+            raise RuntimeError(
+                f"Stage ({names}) gives different results in reverse order, so its "
+                f"systems have undeclared dependencies. {len(differences)} "
+                f"differences, e.g.: {shown}"
+            )
+
+    def _run_buffered(self, event_bus: EventBus, systems, timings=None) -> list:
+        """Update systems one after another, buffering the events each publishes,
+        then queue the events in order. Returns the buffers.
+        """
+        buffers = []
+        event_bus.begin_buffering()
+        try:
+            for system in systems:
+                with event_bus.thread_buffer() as buffer:
+                    if timings is None:
+                        system.update()
+                    else:
+                        self._update(system, timings)
+                buffers.append(buffer)
+        finally:
+            event_bus.end_buffering(buffers)
+
+        return buffers
+
+    def _record(self, timings: dict[str, float]) -> None:
+        self.timings = timings
+        for name, elapsed in timings.items():
+            self.total_timings[name] = self.total_timings.get(name, 0.0) + elapsed
+
+        self.ticks += 1
+
+    def run(self, num_ticks: int) -> None:
+        for _ in range(num_ticks):
+            self.tick()
+
+    def report(self) -> str:
+        """Return the wall time per tick of every system, averaged over every tick
+        run so far.
+        """
+        lines = [f"{self.ticks} ticks"]
+        for name, total in self.total_timings.items():
+            lines.append(f"  {name:<20} {1000 * total / max(self.ticks, 1):9.3f} ms")
+
+        return "\n".join(lines)
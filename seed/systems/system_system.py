@@ -1,45 +1,121 @@
+import numpy as np
+
 from seed.systems.base import System
 from seed.world_state import WorldState
-from seed.common.base_types import SystemComponent, FleetComponent
+from seed.common.base_types import (
+    Entity,
+    SystemComponent,
+    FleetComponent,
+    HaloComponent,
+    NULL_ENTITY,
+    ENTITY_INDEX_MASK,
+)
 from seed.common.events import EventBus
 
 
 class SystemSystem(System):
     """System for managing star systems and their properties."""
 
-    def __init__(self, w: WorldState, event_bus: EventBus):
+    reads = (SystemComponent, FleetComponent)
+    writes = (FleetComponent,)
+
+    def __init__(self, w: WorldState, event_bus: EventBus, verbose: bool = False):
         super().__init__(w, event_bus)
         self.systems = []
+        self.fleets_by_system = None
+
+        # Halo replicas of systems another shard owns (see seed.sharding), which
+        # build ships in that shard, not here
+        self.halo: set[Entity] = set()
+        self.halo_entities = np.empty(0, dtype=np.int64)
+
+        # Print a summary of ship production every tick
+        self.verbose = verbose
+
+        # Production counters for the last tick
+        self.ships_built = 0
+        self.fleets_created = 0
 
     def start(self) -> None:
         # The number of system entities won't change, so there's no point in
         # querying for the same list over and over again.
+        self.halo = {e for e, _ in self.w.get_components(HaloComponent)}
+        self.halo_entities = np.array(sorted(self.halo), dtype=np.int64)
         self.systems = [
-            (entity, sys) for entity, (sys,) in self.w.get_components(SystemComponent)
+            (entity, sys)
+            for entity, (sys,) in self.w.get_components(SystemComponent)
+            if entity not in self.halo
         ]
+        self.fleets_by_system = self.w.index(FleetComponent, "parked_system")
 
     def build_ships(self) -> None:
-        """Build fleets in every system at a rate of 1 per tick."""
-        # First get all fleets that are already parked at some system.
-        systems_with_fleets = set()
-        for entity, (fleet,) in self.w.get_components(FleetComponent):
-            if not fleet.parked_system:
+        """Grow every parked fleet by its system's infrastructure level, then create a
+        fleet in every owned system that has none.
+        """
+        columnar = self.w.is_columnar(SystemComponent) and self.w.is_columnar(
+            FleetComponent
+        )
+        if columnar:
+            new_fleets = self._build_ships_columnar()
+        else:
+            new_fleets = self._build_ships_objects()
+
+        self.w.add_entities(new_fleets)
+        self.fleets_created = len(new_fleets)
+
+        if self.verbose:
+            print(
+                f"Built {self.ships_built} ships and {self.fleets_created} new fleets"
+            )
+
+    def _build_ships_objects(self) -> list[FleetComponent]:
+        self.ships_built = 0
+        for parked_system, fleets in self.fleets_by_system.buckets.items():
+            if not parked_system or parked_system in self.halo:
                 continue
 
-            systems_with_fleets.add(fleet.parked_system)
-            fleet.size += 1
-            print(f"Built 1 ship at {fleet.parked_system}")
-
-        # If there is a system with no fleets parked, create a fleet for that system.
-        for entity, sys_component in self.systems:
-            if sys_component.owning_civ and entity not in systems_with_fleets:
-                self.w.add_entity(
-                    FleetComponent(
-                        owning_civ=sys_component.owning_civ,
-                        size=1,
-                        parked_system=entity,
-                    ),
-                )
+            sys = self.w.get_entity_component(parked_system, SystemComponent)
+            rate = sys.infrastructure
+            for e_fleet in fleets:
+                self.w.get_entity_component(e_fleet, FleetComponent).size += rate
+                self.ships_built += rate
+
+        return [
+            FleetComponent(owning_civ=sys.owning_civ, size=1, parked_system=entity)
+            for entity, sys in self.systems
+            if sys.owning_civ and not self.fleets_by_system[entity]
+        ]
+
+    def _build_ships_columnar(self) -> list[FleetComponent]:
+        systems = self.w.get_column_store(SystemComponent)
+        fleets = self.w.get_column_store(FleetComponent)
+
+        # Map each parked fleet to the row of the system it is parked at
+        parked = fleets.column("parked_system")
+        is_parked = parked != NULL_ENTITY
+        if self.halo:
+            is_parked &= ~np.isin(parked, self.halo_entities)
+        system_rows = systems.rows[parked[is_parked] & ENTITY_INDEX_MASK]
+
+        production = systems.column("infrastructure")[system_rows]
+        fleets.column("size")[is_parked] += production
+        self.w.mark_many_modified(fleets.entities[is_parked].tolist(), FleetComponent)
+        self.ships_built = int(production.sum())
+
+        has_fleet = np.zeros(len(systems), dtype=bool)
+        has_fleet[system_rows] = True
+        owners = systems.column("owning_civ")
+        needs_fleet = (owners != NULL_ENTITY) & ~has_fleet
+        if self.halo:
+            needs_fleet &= ~np.isin(systems.entities, self.halo_entities)
+        needs_fleet = np.flatnonzero(needs_fleet)
+
+        return [
+            FleetComponent(owning_civ=owner, size=1, parked_system=entity)
+            for owner, entity in zip(
+                owners[needs_fleet].tolist(), systems.entities[needs_fleet].tolist()
+            )
+        ]
 
     def update(self) -> None:
         self.build_ships()
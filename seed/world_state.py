@@ -1,69 +1,626 @@
-from seed.common.base_types import Entity, Component
+from seed.common.base_types import (
+    Entity,
+    Component,
+    EntityAllocator,
+    TrackedField,
+    track_field,
+    ENTITY_INDEX_MASK,
+)
 from seed.common.events import Event, EventBus
+from seed.common.columnar import ColumnStore
 
 from collections import defaultdict
-from dataclasses import dataclass
+from dataclasses import dataclass, field, fields
+from functools import wraps
+import threading
 
 
-class WorldState:
+class Archetype:
+    """A table holding every entity that has exactly the same set of component types.
+
+    Each component type gets its own dense column, so the components of the entity
+    at ``entities[row]`` are ``columns[comp_type][row]``. Iterating over an archetype
+    is a linear scan over plain lists instead of one dict probe per component type.
+    """
+
+    def __init__(self, signature: frozenset[type]):
+        self.signature = signature
+        self.entities: list[Entity] = []
+        self.columns: dict[type, list[Component]] = {t: [] for t in signature}
+
+        # Cached queries that match this archetype and need to be invalidated
+        # whenever a row is added or removed.
+        self.queries: list[Query] = []
+
+    def __len__(self) -> int:
+        return len(self.entities)
+
+    def append(self, entity: Entity, components: dict[type, Component]) -> int:
+        """Append a row for entity and return its index."""
+        for query in self.queries:
+            query.rows = None
+
+        self.entities.append(entity)
+        for comp_type, column in self.columns.items():
+            column.append(components[comp_type])
+
+        return len(self.entities) - 1
+
+    def swap_remove(self, row: int) -> tuple[dict[type, Component], Entity | None]:
+        """Remove a row by moving the last row into its slot.
+
+        Returns the components that were stored in the removed row, and the entity
+        that now occupies the row (or None if the removed row was the last one).
+        """
+        for query in self.queries:
+            query.rows = None
+
+        removed = {}
+        last = len(self.entities) - 1
+        for comp_type, column in self.columns.items():
+            removed[comp_type] = column[row]
+            column[row] = column[last]
+            column.pop()
+
+        self.entities[row] = self.entities[last]
+        self.entities.pop()
+
+        moved = self.entities[row] if row < last else None
+        return removed, moved
+
+    def extend(self, entities: list[Entity], columns: dict[type, list]) -> int:
+        """Append one row per entity and return the index of the first new row."""
+        for query in self.queries:
+            query.rows = None
+
+        start = len(self.entities)
+        self.entities.extend(entities)
+        for comp_type, column in self.columns.items():
+            column.extend(columns[comp_type])
+
+        return start
+
+    def remove_rows(self, rows: list[int]) -> dict[Entity, int]:
+        """Swap-remove several rows at once.
+
+        Returns the new row of every entity that was moved to fill a hole.
+        """
+        for query in self.queries:
+            query.rows = None
+
+        moved = {}
+        columns = list(self.columns.values())
+        entities = self.entities
+
+        # Going from the highest row down guarantees that the last row is never
+        # one that is still waiting to be removed.
+        for row in sorted(rows, reverse=True):
+            last = len(entities) - 1
+            for column in columns:
+                column[row] = column[last]
+                column.pop()
+
+            entities[row] = entities[last]
+            entities.pop()
+            if row < last:
+                moved[entities[row]] = row
+
+        return moved
+
+
+class Query:
+    """A cached plan for get_components over a fixed tuple of component types.
+
+    The plan is the list of archetypes whose signature contains every requested
+    type. New archetypes are pushed into matching plans when they are created, and
+    the materialized rows are only rebuilt after a matching archetype gains or
+    loses a row.
+    """
+
+    def __init__(self, component_types: tuple[type, ...]):
+        self.component_types = component_types
+        self.archetypes: list[Archetype] = []
+        self.rows: list[tuple[Entity, tuple[Component, ...]]] | None = None
+
+    def add_archetype(self, archetype: Archetype) -> None:
+        self.archetypes.append(archetype)
+        archetype.queries.append(self)
+        self.rows = None
+
+    def get_rows(self) -> list[tuple[Entity, tuple[Component, ...]]]:
+        if self.rows is None:
+            rows = []
+            for archetype in self.archetypes:
+                columns = [archetype.columns[t] for t in self.component_types]
+                rows.extend(zip(archetype.entities, zip(*columns)))
+
+            self.rows = rows
+
+        return self.rows
+
+
+@dataclass
+class ComponentChanges:
+    """The entities whose component of a single type changed during a tick."""
+
+    added: set[Entity] = field(default_factory=set)
+    removed: set[Entity] = field(default_factory=set)
+    modified: set[Entity] = field(default_factory=set)
+
+
+_NO_CHANGES = ComponentChanges()
+
 
-    # Helper class
-    class EntityToComponentMap:
-        def __init__(self):
-            self.entity_set: set[Entity] = set()
-            self.entity_map: dict[Entity, Component] = dict()
+class FieldIndex:
+    """Entities grouped by the value of one field of a component type.
 
+    Kept up to date by the WorldState as components are added, removed, or have
+    the indexed field assigned, so a lookup costs O(result size).
+    """
+
+    _EMPTY: frozenset[Entity] = frozenset()
+
+    def __init__(self, component_type: type, field_name: str):
+        self.component_type = component_type
+        self.field_name = field_name
+
+        # Field value -> entities. Empty buckets are dropped, so the keys are
+        # exactly the values that currently occur.
+        self.buckets: dict[object, set[Entity]] = {}
+
+    def __getitem__(self, value) -> set[Entity]:
+        """Return the entities whose field equals value. Must not be modified."""
+        return self.buckets.get(value, self._EMPTY)
+
+    def add(self, entity: Entity, value) -> None:
+        bucket = self.buckets.get(value)
+        if bucket is None:
+            self.buckets[value] = {entity}
+        else:
+            bucket.add(entity)
+
+    def remove(self, entity: Entity, value) -> None:
+        bucket = self.buckets[value]
+        bucket.discard(entity)
+        if not bucket:
+            del self.buckets[value]
+
+
+def _structural(method):
+    """Run a method that creates, removes or moves entities under the world's lock,
+    so systems updating on different threads can't interleave them.
+    """
+
+    @wraps(method)
+    def wrapper(self, *args, **kwargs):
+        with self._structure_lock:
+            return method(self, *args, **kwargs)
+
+    return wrapper
+
+
+class WorldState:
     def __init__(self):
-        # self._components: dict[type(Component), EntityToComponentMap]
-        self._components = defaultdict(self.EntityToComponentMap)
+        # frozenset of component types -> Archetype
+        self._archetypes: dict[frozenset[type], Archetype] = {}
 
-    def add_entity(self, *components) -> Entity:
-        new_entity = Entity()
+        self._entities = EntityAllocator()
 
-        for comp_object in components:
-            comp_type = type(comp_object)
-            self._components[comp_type].entity_map[new_entity] = comp_object
-            self._components[comp_type].entity_set.add(new_entity)
+        # Entity index -> (archetype, row), or None for free slots
+        self._locations: list[tuple[Archetype, int] | None] = []
 
-        return new_entity
+        # Component type -> archetypes containing it
+        self._archetypes_by_component: dict[type, list[Archetype]] = defaultdict(list)
+
+        # tuple of component types -> Query
+        self._queries: dict[tuple[type, ...], Query] = {}
+
+        # Component type -> ColumnStore, for types using the columnar backend
+        self._column_stores: dict[type, ColumnStore] = {}
+
+        # Entities to remove at the end of the tick
+        self._despawn_queue: list[Entity] = []
+
+        # Component type -> ComponentChanges, for the tick in progress and for the
+        # last completed tick
+        self._changes: dict[type, ComponentChanges] = defaultdict(ComponentChanges)
+        self._last_changes: dict[type, ComponentChanges] = {}
+
+        # Component type -> field name -> FieldIndex
+        self._indexes: dict[type, dict[str, FieldIndex]] = defaultdict(dict)
+
+        self._structure_lock = threading.RLock()
+
+    # Worlds can be copied (e.g. by Scheduler's determinism check) and pickled,
+    # minus their lock
+    def __getstate__(self) -> dict:
+        state = self.__dict__.copy()
+        del state["_structure_lock"]
+        return state
+
+    def __setstate__(self, state: dict) -> None:
+        self.__dict__.update(state)
+        self._structure_lock = threading.RLock()
+
+    def use_columnar(self, component_type: type, schema: dict | None = None) -> None:
+        """Store component_type in NumPy columns instead of one object per entity.
+
+        get_entity_component and get_components return views for this type, and
+        get_column_store exposes the underlying columns for vectorized updates.
+        Components that are already in the world are moved into the store.
+        """
+        if component_type in self._column_stores:
+            return
+
+        store = ColumnStore(component_type, schema)
+        self._column_stores[component_type] = store
+
+        for archetype in self._archetypes_by_component[component_type]:
+            column = archetype.columns[component_type]
+            for row, entity in enumerate(archetype.entities):
+                column[row]._world = None
+                view = store.add(entity, column[row])
+                view._world = self
+                view._entity = entity
+                column[row] = view
+
+            # Cached query rows still hold the detached objects
+            for query in archetype.queries:
+                query.rows = None
+
+    def is_columnar(self, component_type: type) -> bool:
+        return component_type in self._column_stores
+
+    def get_column_store(self, component_type: type) -> ColumnStore:
+        return self._column_stores[component_type]
+
+    def _store_component(self, entity: Entity, comp_object: Component) -> Component:
+        """Attach a new component to entity and return the object to keep in its
+        archetype column.
+        """
+        comp_type = type(comp_object)
+        store = self._column_stores.get(comp_type)
+        if store is not None and not isinstance(comp_object, store.view_class):
+            comp_object = store.add(entity, comp_object)
+
+        comp_object._world = self
+        comp_object._entity = entity
+        self._changes[comp_type].added.add(entity)
+
+        for field_name, index in self._indexes.get(comp_type, {}).items():
+            index.add(entity, getattr(comp_object, field_name))
+
+        return comp_object
+
+    def _to_storage(self, entity: Entity, components) -> dict[type, Component]:
+        return {type(c): self._store_component(entity, c) for c in components}
 
-    def add_to_entity(self, entity: Entity, **components) -> Entity:
+    def _release_storage(self, entity: Entity, components: dict) -> None:
         for comp_type, comp_object in components.items():
-            self._components[comp_type].entity_map[entity] = comp_object
+            # Detach, so writes to a removed component are no longer tracked
+            comp_object._world = None
+
+            for field_name, index in self._indexes.get(comp_type, {}).items():
+                index.remove(entity, getattr(comp_object, field_name))
+
+            store = self._column_stores.get(comp_type)
+            if store is not None:
+                store.remove(entity)
+
+            changes = self._changes[comp_type]
+            changes.modified.discard(entity)
+            if entity in changes.added:
+                # Added and removed within the same tick, so nobody saw it
+                changes.added.discard(entity)
+            else:
+                changes.removed.add(entity)
+
+    def _get_archetype(self, signature: frozenset[type]) -> Archetype:
+        archetype = self._archetypes.get(signature)
+        if archetype is None:
+            archetype = Archetype(signature)
+            self._archetypes[signature] = archetype
+
+            for comp_type in signature:
+                self._archetypes_by_component[comp_type].append(archetype)
+
+            for query in self._queries.values():
+                if signature.issuperset(query.component_types):
+                    query.add_archetype(archetype)
+
+        return archetype
+
+    def _insert(self, entity: Entity, components: dict[type, Component]) -> None:
+        archetype = self._get_archetype(frozenset(components))
+        row = archetype.append(entity, components)
+        self._locations[entity & ENTITY_INDEX_MASK] = (archetype, row)
+
+    def _locate(self, entity: Entity) -> tuple[Archetype, int]:
+        """Return the archetype and row of entity. Raises KeyError for stale handles."""
+        index = entity & ENTITY_INDEX_MASK
+        location = self._locations[index] if index < len(self._locations) else None
+
+        # The archetype row stores the full entity, so a stale handle whose slot
+        # has been recycled fails this comparison on its generation bits.
+        if location is None or location[0].entities[location[1]] != entity:
+            raise KeyError(entity)
+
+        return location
+
+    def _extract(self, entity: Entity) -> dict[type, Component]:
+        """Remove entity's row from its archetype and return its components."""
+        archetype, row = self._locate(entity)
+        self._locations[entity & ENTITY_INDEX_MASK] = None
+
+        removed, moved = archetype.swap_remove(row)
+        if moved is not None:
+            self._locations[moved & ENTITY_INDEX_MASK] = (archetype, row)
+
+        return removed
+
+    @_structural
+    def add_entity(self, *components) -> Entity:
+        new_entity = self._entities.create()
+        if self._entities.capacity > len(self._locations):
+            self._locations.append(None)
+
+        self._insert(new_entity, self._to_storage(new_entity, components))
+        return new_entity
+
+    @_structural
+    def add_entities(self, *component_lists) -> list[Entity]:
+        """Add many entities with the same component types in one batch.
+
+        Each argument is a list holding one component type, and entity i gets the
+        i-th component of every list. All entities land in one archetype, so its
+        cached queries are only invalidated once.
+        """
+        if not component_lists or not component_lists[0]:
+            return []
+
+        entities = [self._entities.create() for _ in component_lists[0]]
+        missing = self._entities.capacity - len(self._locations)
+        if missing > 0:
+            self._locations.extend([None] * missing)
+
+        columns = {
+            type(components[0]): [
+                self._store_component(e, c) for e, c in zip(entities, components)
+            ]
+            for components in component_lists
+        }
+
+        archetype = self._get_archetype(frozenset(columns))
+        start = archetype.extend(entities, columns)
+        for row, entity in enumerate(entities, start):
+            self._locations[entity & ENTITY_INDEX_MASK] = (archetype, row)
+
+        return entities
+
+    @_structural
+    def add_to_entity(self, entity: Entity, *components) -> Entity:
+        # Adding components changes the entity's archetype, so its row moves.
+        current = self._extract(entity)
+        replaced = {
+            type(c): current[type(c)] for c in components if type(c) in current
+        }
+        # Replacing a component counts as modifying it, unless it was only added
+        # this tick, in which case it's still just added
+        new = {t for t in replaced if entity in self._changes[t].added}
+        self._release_storage(entity, replaced)
+        current.update(self._to_storage(entity, components))
+        self._insert(entity, current)
+
+        for comp_type in replaced.keys() - new:
+            changes = self._changes[comp_type]
+            changes.removed.discard(entity)
+            changes.added.discard(entity)
+            changes.modified.add(entity)
 
         return entity
 
+    @_structural
     def remove_entity(self, entity: Entity) -> None:
-        for comp_type in self._components.items():
-            del self._components[comp_type][entity]
-            self._components[comp_type].remove(entity)
+        removed = self._extract(entity)
+        self._release_storage(entity, removed)
+        self._entities.destroy(entity)
 
-    def remove_from_entity(self, entity: Entity, **components) -> None:
-        for comp_type, comp_object in components.items():
-            del self._components[comp_type][entity]
+    @_structural
+    def despawn(self, entity: Entity) -> None:
+        """Queue entity for removal. It stays alive until flush_despawned() runs."""
+        self._despawn_queue.append(entity)
+
+    @_structural
+    def flush_despawned(self) -> int:
+        """Remove every queued entity in one batch. Called by end_tick().
+
+        Returns the number of entities removed.
+        """
+        rows_by_archetype = defaultdict(list)
+        removed = 0
+        for entity in self._despawn_queue:
+            # Skip entities that were despawned twice or already removed
+            if not self._entities.is_alive(entity):
+                continue
+
+            archetype, row = self._locate(entity)
+            rows_by_archetype[archetype].append(row)
+            self._locations[entity & ENTITY_INDEX_MASK] = None
+
+            self._release_storage(
+                entity, {t: c[row] for t, c in archetype.columns.items()}
+            )
+            self._entities.destroy(entity)
+            removed += 1
+
+        for archetype, rows in rows_by_archetype.items():
+            for moved, row in archetype.remove_rows(rows).items():
+                self._locations[moved & ENTITY_INDEX_MASK] = (archetype, row)
+
+        self._despawn_queue.clear()
+        return removed
+
+    @_structural
+    def remove_from_entity(self, entity: Entity, *component_types) -> None:
+        current = self._extract(entity)
+        self._release_storage(entity, {t: current.pop(t) for t in component_types})
+
+        self._insert(entity, current)
+
+    def index(self, component_type: type, field_name: str) -> FieldIndex:
+        """Return an index of the entities with component_type by the value of one of
+        its fields, creating it on first use.
+
+        The index follows additions, removals and assignments to the field. Writing
+        to the field's ColumnStore column directly bypasses it.
+        """
+        index = self._indexes[component_type].get(field_name)
+        if index is None:
+            track_field(component_type, field_name)
+            index = FieldIndex(component_type, field_name)
+            for entity in self.filter_entities(component_type):
+                component = self.get_entity_component(entity, component_type)
+                index.add(entity, getattr(component, field_name))
+
+            self._indexes[component_type][field_name] = index
+
+        return index
+
+    def set_component_field(self, component: Component, name: str, value) -> None:
+        """Assign to a field of a stored component, updating indexes and change
+        tracking. Assignments to tracked fields (see track_field) are routed here.
+        """
+        comp_type = component._component_type
+        entity = component._entity
+
+        indexes = self._indexes.get(comp_type)
+        index = indexes.get(name) if indexes else None
+        if index is not None:
+            index.remove(entity, getattr(component, name))
+            index.add(entity, value)
+
+        descriptor = getattr(type(component), name, None)
+        if isinstance(descriptor, TrackedField):
+            descriptor.store(component, value)
+        else:
+            object.__setattr__(component, name, value)
+
+        self._changes[comp_type].modified.add(entity)
+
+    def track_changes(self, component_type: type) -> None:
+        """Record assignments to every field of component_type as modifications
+        from now on. Only indexed fields are tracked otherwise, since routing every
+        assignment through the world is slow; changes() and changed() call this on
+        first use, so assignments made before then aren't reported.
+        """
+        for f in fields(component_type):
+            track_field(component_type, f.name)
+
+    def mark_modified(self, entity: Entity, component_type: type) -> None:
+        """Record that entity's component_type changed this tick.
+
+        Assigning to a tracked field does this automatically. Call it directly
+        after assigning to an untracked field, after mutating a component in place
+        (e.g. appending to a list field) or after writing to a ColumnStore column.
+        """
+        self._changes[component_type].modified.add(entity)
+
+    def mark_many_modified(self, entities, component_type: type) -> None:
+        """Like mark_modified, for a whole batch of entities (e.g. a column's
+        ColumnStore.entities after a vectorized update).
+        """
+        self._changes[component_type].modified.update(entities)
+
+    def changes(self, component_type: type) -> ComponentChanges:
+        """Return the entities whose component_type was added, removed or modified
+        during the last completed tick.
+        """
+        self.track_changes(component_type)
+        return self._last_changes.get(component_type, _NO_CHANGES)
+
+    def changed(self, component_type: type) -> set[Entity]:
+        """Return the entities whose component_type was added or modified during
+        the last completed tick.
+        """
+        changes = self.changes(component_type)
+        return changes.added | changes.modified
+
+    def current_changes(self) -> dict[type, ComponentChanges]:
+        """Return the changes recorded so far in the tick in progress, by component
+        type. The result is live and must not be modified.
+        """
+        return self._changes
+
+    def end_tick(self) -> None:
+        """Flush despawned entities and start tracking changes for a new tick."""
+        self.flush_despawned()
+        self._last_changes = self._changes
+        self._changes = defaultdict(ComponentChanges)
+
+    def snapshot(self) -> dict[Entity, dict[type, tuple]]:
+        """Return every entity's components as tuples of their field values, e.g.
+        to check whether two worlds are in the same state.
+        """
+        snapshot = {}
+        for archetype in self._archetypes.values():
+            for row, entity in enumerate(archetype.entities):
+                snapshot[entity] = {
+                    comp_type: tuple(
+                        getattr(column[row], f.name) for f in fields(comp_type)
+                    )
+                    for comp_type, column in archetype.columns.items()
+                }
+
+        return snapshot
+
+    def has_entity(self, entity: Entity) -> bool:
+        return self._entities.is_alive(entity)
+
+    def has_component(self, entity: Entity, component_type: type) -> bool:
+        archetype, _ = self._locate(entity)
+        return component_type in archetype.signature
 
     def get_entity_component(self, entity: Entity, component_type):
-        return self._components[component_type].entity_map[entity]
+        archetype, row = self._locate(entity)
+        return archetype.columns[component_type][row]
 
     def filter_entities(self, component_type, predicate=None):
         """Return a list of entities containing a component_type for which predicate is
         true.
         """
-        for entity in self._components[component_type].entity_set:
-            if predicate is None or predicate(
-                self._components[component_type].entity_map[entity]
-            ):
-                yield entity
+        for archetype in list(self._archetypes_by_component[component_type]):
+            column = archetype.columns[component_type]
+            for entity, component in zip(archetype.entities, column):
+                if predicate is None or predicate(component):
+                    yield entity
+
+    def _plan(self, component_types: tuple[type, ...]) -> Query:
+        query = Query(component_types)
+
+        # Only the archetypes of the rarest component type can possibly match, so
+        # start from the smallest candidate list and probe the others.
+        candidates = min(
+            (self._archetypes_by_component[t] for t in component_types), key=len
+        )
+        for archetype in candidates:
+            if archetype.signature.issuperset(component_types):
+                query.add_archetype(archetype)
+
+        return query
 
     def get_components(self, *component_types):
-        # Return an entity and all the components belonging to that entity. Components
-        # are returned in the order specified in get_components.
-
-        # Single-component case that we can optimize for.
-        if len(component_types) == 1:
-            comp_type = component_types[0]
-            m = self._components[comp_type].entity_map
-            l = [
-                (e, (c,)) for e, c in m.items()
-            ]
-            return l
+        """Return (entity, (component, ...)) for every entity that has all of
+        component_types. Components are returned in the order they were requested.
+
+        The returned list is cached and shared between callers until a matching
+        entity is added or removed, so it must not be modified.
+        """
+        query = self._queries.get(component_types)
+        if query is None:
+            with self._structure_lock:
+                query = self._queries.get(component_types)
+                if query is None:
+                    query = self._plan(component_types)
+                    self._queries[component_types] = query
+
+        return query.get_rows()
@@ -0,0 +1,52 @@
+import copy
+from dataclasses import dataclass
+
+from seed.common.events import Event, EventBus
+
+
+@dataclass(slots=True)
+class Ping(Event):
+    value: int
+
+
+def test_event_published_twice_is_pooled_once():
+    event_bus = EventBus(pool_size=8)
+    seen = []
+    event_bus.subscribe(Ping, lambda event: seen.append(event.value))
+
+    event = event_bus.acquire(Ping, 1)
+    event_bus.publish(event)
+    event_bus.publish(event)
+    event_bus.dispatch()
+    assert seen == [1, 1]
+
+    first = event_bus.acquire(Ping, 2)
+    second = event_bus.acquire(Ping, 3)
+    assert first is not second
+    assert (first.value, second.value) == (2, 3)
+
+
+def test_copied_bus_pools_each_event_once():
+    event_bus = EventBus(pool_size=8)
+    event = event_bus.acquire(Ping, 1)
+    event_bus.publish(event)
+    event_bus.dispatch()
+
+    copied = copy.deepcopy(event_bus)
+    [pooled] = copied._pool[Ping]
+    copied.publish(pooled)
+    copied.dispatch()
+    assert len(copied._pool[Ping]) == 1
+
+
+def test_batch_subscribers_run_after_every_per_event_subscriber():
+    event_bus = EventBus()
+    calls = []
+    event_bus.subscribe_batch(Ping, lambda events: calls.append("late batch"), 5)
+    event_bus.subscribe_batch(Ping, lambda events: calls.append("batch"), -100)
+    event_bus.subscribe(Ping, lambda event: calls.append("event"), 100)
+
+    event_bus.publish(Ping(1))
+    event_bus.publish(Ping(2))
+    event_bus.dispatch()
+    assert calls == ["event", "event", "batch", "late batch"]
@@ -0,0 +1,39 @@
+import math
+import random
+
+import numpy as np
+
+from seed.common.galaxy import generate_galaxy
+from seed.common.spatial import SpatialGrid
+from seed.common.graph import CSRGraph, astar
+from seed.common.hierarchical import HierarchicalRouter
+
+
+def path_length(positions, path) -> float:
+    return sum(math.dist(positions[a], positions[b]) for a, b in zip(path, path[1:]))
+
+
+def test_max_stretch_bounds_path_length():
+    rng = random.Random(0)
+    positions = generate_galaxy(1500, radius=80, rng=np.random.default_rng(0)).tolist()
+    graph = CSRGraph.within_range(SpatialGrid(positions, 8), 8)
+    router = HierarchicalRouter(
+        graph, positions, 32, 16, max_stretch=1.2, local_path_cache_size=64
+    )
+
+    queries = 0
+    for _ in range(60):
+        source, target = rng.randrange(len(positions)), rng.randrange(len(positions))
+        flat = astar(graph, positions, source, target)
+        path = router.find_path(source, target)
+        assert bool(path) == bool(flat)
+        if len(flat) > 1:
+            optimal = path_length(positions, flat)
+            assert router.lower_bound(source, target) <= optimal + 1e-9
+            assert path_length(positions, path) <= 1.2 * optimal + 1e-9
+            queries += 1
+
+    # The spiral arms make the straight line a poor bound, the landmarks don't
+    assert queries > 30
+    assert router.fallbacks < queries // 4
+    assert len(router._local_paths) <= 64
@@ -0,0 +1,91 @@
+import math
+import random
+
+import numpy as np
+
+from seed.common.distances import DistanceMatrix
+from seed.common.lightspeed import LightspeedNetwork
+
+
+def test_inboxes_match_brute_force():
+    rng = random.Random(0)
+    positions = np.array([(rng.uniform(0, 30), rng.uniform(0, 30)) for _ in range(40)])
+    network = LightspeedNetwork(DistanceMatrix(positions), speed=2.0)
+
+    # Receiver -> (delivery tick, payload) of every delivery. Payloads are sent in
+    # increasing order, so they break ties the way arrival order does.
+    expected = {r: [] for r in range(len(positions))}
+    read_until = [0] * len(positions)
+    payload = 0
+
+    def delivery_tick(sender, receiver, now):
+        distance = math.dist(positions[sender], positions[receiver])
+        return now + max(math.ceil(distance / 2.0), 1)
+
+    def check_inbox(receiver):
+        now = network.current_tick
+        due = sorted(
+            (tick, p)
+            for tick, p in expected[receiver]
+            if read_until[receiver] < tick <= now
+        )
+        assert [m.payload for m in network.inbox(receiver)] == [p for _, p in due]
+        read_until[receiver] = now
+
+    for _ in range(200):
+        now = network.current_tick
+        for _ in range(rng.randrange(4)):
+            sender = rng.randrange(len(positions))
+            payload += 1
+            if rng.random() < 0.5:
+                receiver = rng.randrange(len(positions))
+                network.send(sender, receiver, payload)
+                expected[receiver].append(
+                    (delivery_tick(sender, receiver, now), payload)
+                )
+            else:
+                max_range = rng.uniform(5, 40)
+                network.broadcast(sender, payload, max_range)
+                for receiver in range(len(positions)):
+                    distance = math.dist(positions[sender], positions[receiver])
+                    if receiver != sender and distance <= max_range:
+                        expected[receiver].append(
+                            (delivery_tick(sender, receiver, now), payload)
+                        )
+
+        network.advance()
+
+        # Receiver 0 never reads until the end, the others now and then
+        for receiver in range(1, len(positions)):
+            if rng.random() < 0.3:
+                check_inbox(receiver)
+
+    for receiver in range(len(positions)):
+        check_inbox(receiver)
+
+    assert network.unread == 0
+
+
+def test_idle_receiver_doesnt_keep_every_block():
+    positions = np.random.default_rng(0).uniform(0, 10, (50, 2))
+    network = LightspeedNetwork(DistanceMatrix(positions))
+
+    def run(num_ticks):
+        for tick in range(num_ticks):
+            network.broadcast(1 + tick % 49, tick)
+            network.advance()
+            for receiver in range(1, 50):
+                network.inbox(receiver)
+
+    # Receiver 0 never reads, so only its own unread deliveries are kept
+    run(500)
+    assert len(network._blocks) <= 20
+    assert network.unread == len(network.inbox(0))
+    assert network.unread == 0
+
+    # Once it stops listening, nothing is kept for it
+    network.set_listening(0, False)
+    run(500)
+    assert network.dropped > 0
+    assert network.unread == 0
+    assert len(network._messages) <= 20
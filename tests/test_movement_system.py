@@ -0,0 +1,127 @@
+import math
+import random
+
+import numpy as np
+
+from seed.world_state import WorldState
+from seed.common.base_types import SystemComponent, FleetComponent
+from seed.common.events import EventBus, FleetArrivedAtSystemEvent
+from seed.systems import RoutingSystem, MovementSystem
+
+
+def build(positions, num_fleets):
+    w = WorldState()
+    event_bus = EventBus()
+    for position in positions:
+        w.add_entity(SystemComponent(position=position))
+
+    fleets = [
+        w.add_entity(FleetComponent(owning_civ=None, size=1, parked_system=None))
+        for _ in range(num_fleets)
+    ]
+    routing = RoutingSystem(w, event_bus)
+    routing.start()
+    return w, event_bus, routing, MovementSystem(w, event_bus, routing), fleets
+
+
+def arrival_tick(positions, route, start=0):
+    return start + sum(
+        max(math.ceil(math.dist(positions[a], positions[b])), 1)
+        for a, b in zip(route, route[1:])
+    )
+
+
+def test_fleets_arrive_after_every_leg():
+    positions = [(0.0, 0.0), (3.0, 0.0), (3.0, 4.0), (10.0, 4.0), (10.0, 4.5)]
+    w, event_bus, routing, movement, fleets = build(positions, 3)
+    arrived = []
+    event_bus.subscribe(
+        FleetArrivedAtSystemEvent,
+        lambda event: arrived.append((event_bus.current_tick, event.fleet)),
+    )
+
+    # Legs of 3, 4 and 7 ticks; one of 7; a short leg still takes a tick
+    routes = [[0, 1, 2, 3], [3, 2], [3, 4]]
+    movement.depart(fleets, routes)
+
+    for _ in range(20):
+        event_bus.advance_time()
+        movement.update()
+        event_bus.dispatch()
+
+    assert sorted(arrived) == sorted(
+        (arrival_tick(positions, route), fleet) for fleet, route in zip(fleets, routes)
+    )
+    assert [t for t, _ in sorted(arrived)] == [1, 7, 14]
+    for fleet, route in zip(fleets, routes):
+        parked = w.get_entity_component(fleet, FleetComponent).parked_system
+        assert parked == routing.systems[route[-1]][0]
+    assert len(movement) == 0
+
+
+def test_skipped_updates_fly_several_legs_at_once():
+    positions = [(0.0, 0.0), (1.0, 0.0), (2.0, 0.0), (3.0, 0.0)]
+    w, event_bus, routing, movement, fleets = build(positions, 1)
+    movement.depart(fleets, [[0, 1, 2, 3]])
+
+    event_bus.current_tick = 2
+    movement.update()
+    assert (movement.arrived, len(movement)) == (0, 1)
+
+    event_bus.current_tick = 5
+    movement.update()
+    assert (movement.arrived, len(movement)) == (1, 0)
+
+
+def test_reserve_compacts_flown_hops():
+    rng = random.Random(0)
+    positions = [(rng.uniform(0, 20), rng.uniform(0, 20)) for _ in range(30)]
+    w, event_bus, routing, movement, fleets = build(positions, 200)
+    movement.hops = np.zeros(16, dtype=np.int64)
+
+    expected = []  # (arrival tick, fleet, target system)
+    arrived = []
+    event_bus.subscribe(
+        FleetArrivedAtSystemEvent,
+        lambda event: arrived.append(
+            (event_bus.current_tick, event.fleet, event.system)
+        ),
+    )
+
+    # Fleets fly off again once they've arrived
+    parked = list(fleets)
+    total_hops = 0
+    for tick in range(500):
+        batch = [parked.pop(rng.randrange(len(parked))) for _ in range(3)]
+        routes = [rng.sample(range(len(positions)), rng.randrange(2, 8)) for _ in batch]
+        total_hops += sum(map(len, routes))
+        for fleet, route in zip(batch, routes):
+            expected.append(
+                (
+                    arrival_tick(positions, route, tick),
+                    fleet,
+                    routing.systems[route[-1]][0],
+                )
+            )
+        movement.depart(batch, routes)
+
+        # Every in-flight fleet still has its remaining route in the buffer
+        n = len(movement)
+        assert (movement.hop[:n] >= 1).all()
+        assert (movement.hop[:n] < movement.end[:n]).all()
+        assert (movement.end[:n] <= movement.hops_used).all()
+
+        event_bus.advance_time()
+        movement.update()
+        event_bus.dispatch()
+        parked.extend(fleet for t, fleet, _ in arrived if t == event_bus.current_tick)
+
+    while len(movement):
+        event_bus.advance_time()
+        movement.update()
+        event_bus.dispatch()
+
+    assert sorted(arrived) == sorted(expected)
+
+    # Flown hops were dropped rather than kept around in an ever growing buffer
+    assert len(movement.hops) < total_hops // 4
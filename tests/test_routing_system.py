@@ -0,0 +1,113 @@
+import math
+import random
+
+from seed.world_state import WorldState
+from seed.common.base_types import (
+    SystemComponent,
+    CivilizationComponent,
+    FleetComponent,
+)
+from seed.common.events import EventBus
+from seed.common.utils import transfer_system_ownership
+from seed.systems import RoutingSystem, Scheduler
+
+
+def brute_force_reachable(w, e_civ):
+    civ = w.get_entity_component(e_civ, CivilizationComponent)
+    owned = [
+        w.get_entity_component(e_sys, SystemComponent).position
+        for e_sys in civ.owned_systems
+    ]
+    return {
+        e_sys
+        for e_sys, (sys,) in w.get_components(SystemComponent)
+        if sys.owning_civ != e_civ
+        and any(
+            0 < math.dist(sys.position, position) <= civ.ship_range
+            for position in owned
+        )
+    }
+
+
+def test_reachable_systems_match_brute_force():
+    for seed in range(10):
+        rng = random.Random(seed)
+        w = WorldState()
+        event_bus = EventBus()
+        systems = [
+            w.add_entity(
+                SystemComponent(position=(rng.uniform(0, 40), rng.uniform(0, 40)))
+            )
+            for _ in range(150)
+        ]
+        civs = [w.add_entity(CivilizationComponent(ship_range=6)) for _ in range(3)]
+
+        # Home systems, published before anything is running. Scheduler.start()
+        # dispatches these after RoutingSystem has counted them.
+        for e_civ, e_sys in zip(civs, rng.sample(systems, len(civs))):
+            transfer_system_ownership(w, event_bus, e_sys, e_civ)
+
+        routing = RoutingSystem(w, event_bus)
+        scheduler = Scheduler(w, event_bus, [routing])
+        scheduler.start()
+
+        for _ in range(30):
+            for _ in range(rng.randrange(1, 6)):
+                owner = rng.choice(civs + [None])
+                transfer_system_ownership(w, event_bus, rng.choice(systems), owner)
+
+            if rng.random() < 0.2:
+                civ = w.get_entity_component(rng.choice(civs), CivilizationComponent)
+                civ.ship_range = rng.choice([4, 6, 9])
+
+            scheduler.tick()
+
+            for e_civ in civs:
+                civ = w.get_entity_component(e_civ, CivilizationComponent)
+                assert len(set(civ.reachable_systems)) == len(civ.reachable_systems)
+                assert set(civ.reachable_systems) == brute_force_reachable(w, e_civ)
+
+
+def test_batch_routing_searches_unshared_routes_directly():
+    rng = random.Random(0)
+    w = WorldState()
+    event_bus = EventBus()
+    systems = [
+        w.add_entity(SystemComponent(position=(rng.uniform(0, 40), rng.uniform(0, 40))))
+        for _ in range(200)
+    ]
+    e_civ = w.add_entity(CivilizationComponent(ship_range=8))
+    fleets = [
+        w.add_entity(FleetComponent(owning_civ=e_civ, size=1, parked_system=None))
+        for _ in range(3)
+    ]
+
+    routing = RoutingSystem(
+        w, event_bus, batch_routing=True, hierarchical_min_systems=1
+    )
+    Scheduler(w, event_bus, [routing]).start()
+
+    searched = []
+    get_cached_path = routing.get_cached_path
+
+    def spy(*args):
+        searched.append(args)
+        return get_cached_path(*args)
+
+    routing.get_cached_path = spy
+
+    # Two routes share a source and get one tree, the third is searched alone
+    requests = [
+        (fleets[0], systems[0], systems[1]),
+        (fleets[1], systems[0], systems[2]),
+        (fleets[2], systems[3], systems[4]),
+    ]
+    routing.pending_routes.extend(requests)
+    routing.resolve_pending_routes()
+
+    assert searched == [(8, 3, 4)]
+    assert routing.route_cache.get((8, 3, 4), routing.get_graph(8).version)
+    for fleet, source, target in requests:
+        route = routing.fleet_routes[fleet]
+        assert route[0][0] == source and route[-1][1] == target
+        assert all(a[1] == b[0] for a, b in zip(route, route[1:]))
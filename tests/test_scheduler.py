@@ -0,0 +1,113 @@
+import contextlib
+import io
+import random
+
+import numpy as np
+import pytest
+
+from seed.world_state import WorldState
+from seed.common.base_types import (
+    SystemComponent,
+    CivilizationComponent,
+    FleetComponent,
+)
+from seed.common.events import EventBus, TinkerTaskStartedEvent
+from seed.common.galaxy import generate_galaxy
+from seed.common.utils import transfer_system_ownership
+from seed.systems import (
+    System,
+    SystemSystem,
+    RoutingSystem,
+    MovementSystem,
+    CivilizationSystem,
+    Scheduler,
+)
+
+
+def build_world(num_systems=150, num_civs=4, seed=1):
+    rng = random.Random(seed)
+    w = WorldState()
+    event_bus = EventBus()
+    positions = generate_galaxy(num_systems, rng=np.random.default_rng(seed))
+    systems = [
+        w.add_entity(SystemComponent(position=tuple(position)))
+        for position in positions.tolist()
+    ]
+
+    for e_sys in rng.sample(systems, num_civs):
+        e_civ = w.add_entity(CivilizationComponent())
+        transfer_system_ownership(w, event_bus, e_sys, e_civ)
+
+    return w, event_bus
+
+
+def run_game(num_ticks=20, **kwargs):
+    w, event_bus = build_world()
+    routing = RoutingSystem(w, event_bus)
+    systems = [
+        SystemSystem(w, event_bus),
+        routing,
+        MovementSystem(w, event_bus, routing),
+        CivilizationSystem(w, event_bus),
+    ]
+    scheduler = Scheduler(w, event_bus, systems, strict=True, **kwargs)
+    scheduler.start()
+
+    random.seed(5)
+    with contextlib.redirect_stdout(io.StringIO()):
+        scheduler.run(num_ticks)
+
+    scheduler.close()
+    return w.snapshot()
+
+
+def test_check_determinism_doesnt_change_results():
+    assert run_game() == run_game(check_determinism=True)
+    assert run_game() == run_game(workers=4)
+
+
+class Grower(System):
+    reads = (FleetComponent,)
+    writes = (FleetComponent,)
+
+    def update(self):
+        for _, (fleet,) in self.w.get_components(FleetComponent):
+            fleet.size += 1
+
+
+class SneakyCounter(System):
+    """Reads fleet sizes without declaring it."""
+
+    def update(self):
+        ships = sum(fleet.size for _, (fleet,) in self.w.get_components(FleetComponent))
+        self.event_bus.publish(TinkerTaskStartedEvent(ships))
+
+
+class SneakyCopier(System):
+    """Copies fleet sizes into system infrastructure, declaring only the write."""
+
+    writes = (SystemComponent,)
+
+    def update(self):
+        for _, (fleet,) in self.w.get_components(FleetComponent):
+            system = self.w.get_entity_component(fleet.parked_system, SystemComponent)
+            system.infrastructure = fleet.size
+
+
+@pytest.mark.parametrize("sneaky", [SneakyCounter, SneakyCopier])
+def test_check_determinism_catches_undeclared_reads(sneaky):
+    w, event_bus = build_world(num_systems=20)
+    e_sys, _ = w.get_components(SystemComponent)[0]
+    w.add_entity(FleetComponent(owning_civ=None, size=1, parked_system=e_sys))
+
+    scheduler = Scheduler(
+        w, event_bus, [Grower(w, event_bus), sneaky(w, event_bus)]
+    )
+    assert len(scheduler.stages) == 1
+    scheduler.start()
+
+    scheduler.tick()
+
+    scheduler.check_determinism = True
+    with pytest.raises(RuntimeError, match="reverse order"):
+        scheduler.tick()
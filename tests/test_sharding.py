@@ -0,0 +1,134 @@
+import numpy as np
+import pytest
+
+from seed.sharding import ShardedGalaxy
+from seed.world_state import WorldState
+from seed.common.base_types import (
+    SystemComponent,
+    CivilizationComponent,
+    FleetComponent,
+    HaloComponent,
+)
+from seed.common.events import EventBus
+from seed.common.galaxy import generate_galaxy
+from seed.common.utils import transfer_system_ownership
+from seed.systems import (
+    RoutingSystem,
+    SystemSystem,
+    MovementSystem,
+    CivilizationSystem,
+    Scheduler,
+)
+
+
+def make_systems(w, event_bus):
+    return [RoutingSystem(w, event_bus), SystemSystem(w, event_bus)]
+
+
+def make_moving_systems(w, event_bus):
+    # No SystemSystem, so no ships are built and the totals stay the same
+    routing = RoutingSystem(w, event_bus)
+    return [
+        routing,
+        MovementSystem(w, event_bus, routing),
+        CivilizationSystem(w, event_bus),
+    ]
+
+
+def run_unsharded(positions, owners, num_civs, fleets, num_ticks):
+    w = WorldState()
+    event_bus = EventBus()
+
+    civs = [w.add_entity(CivilizationComponent()) for _ in range(num_civs)]
+    systems = []
+    for position, owner in zip(positions.tolist(), owners.tolist()):
+        e_sys = w.add_entity(
+            SystemComponent(
+                position=tuple(position), owning_civ=civs[owner - 1] if owner else None
+            )
+        )
+        if owner:
+            civ = w.get_entity_component(civs[owner - 1], CivilizationComponent)
+            civ.owned_systems.append(e_sys)
+        systems.append(e_sys)
+
+    for civ, size, system in fleets.tolist():
+        fleet = FleetComponent(
+            owning_civ=civs[civ], size=size, parked_system=systems[system]
+        )
+        w.add_entity(fleet)
+
+    scheduler = Scheduler(w, event_bus, make_systems(w, event_bus))
+    scheduler.start()
+    scheduler.run(num_ticks)
+
+    fleets = w.get_components(FleetComponent)
+    return len(fleets), sum(fleet.size for _, (fleet,) in fleets)
+
+
+def test_sharded_run_matches_unsharded():
+    rng = np.random.default_rng(0)
+    positions = generate_galaxy(400, radius=50, rng=rng)
+    owners = rng.integers(0, 4, 400)  # civ + 1, or 0 for unowned
+    fleets = np.array(
+        [(owner - 1, 5, i) for i, owner in enumerate(owners.tolist()) if owner][:50]
+    )
+    num_ticks = 4
+
+    with ShardedGalaxy(
+        positions, owners, num_civs=3, fleets=fleets, make_systems=make_systems
+    ) as galaxy:
+        galaxy.run(num_ticks)
+        sharded = (
+            sum(stats["fleets"] for stats in galaxy.stats),
+            sum(stats["ships"] for stats in galaxy.stats),
+        )
+        assert sum(stats["crossings"] for stats in galaxy.stats) == 0
+        assert (galaxy.owners == owners).all()
+
+    assert sharded == run_unsharded(positions, owners, 3, fleets, num_ticks)
+
+
+def test_fleets_crossing_shards_are_conserved():
+    rng = np.random.default_rng(1)
+    positions = generate_galaxy(300, radius=40, rng=rng)
+    owners = rng.integers(0, 4, 300)
+    fleets = np.array(
+        [(owner - 1, i % 7 + 1, i) for i, owner in enumerate(owners.tolist()) if owner]
+    )
+    num_fleets, num_ships = len(fleets), int(fleets[:, 1].sum())
+
+    crossings = 0
+    with ShardedGalaxy(
+        positions, owners, num_civs=3, fleets=fleets, make_systems=make_moving_systems
+    ) as galaxy:
+        for _ in range(30):
+            galaxy.tick()
+            crossings += sum(stats["crossings"] for stats in galaxy.stats)
+
+            # Fleets that crossed are waiting in the inboxes of their new shards
+            crossing = [
+                np.frombuffer(data, dtype=np.int64).reshape(-1, 3)
+                for inbox in galaxy._inboxes
+                for data in inbox
+            ]
+            total_fleets = sum(stats["fleets"] for stats in galaxy.stats)
+            total_ships = sum(stats["ships"] for stats in galaxy.stats)
+            total_fleets += sum(len(rows) for rows in crossing)
+            total_ships += sum(int(rows[:, 1].sum()) for rows in crossing)
+            assert (total_fleets, total_ships) == (num_fleets, num_ships)
+
+    assert crossings > 10
+
+
+def test_halo_owner_cant_change_locally():
+    w = WorldState()
+    event_bus = EventBus()
+    civ = w.add_entity(CivilizationComponent())
+    halo = w.add_entity(SystemComponent(position=(0.0, 0.0)), HaloComponent(1))
+
+    with pytest.raises(ValueError):
+        transfer_system_ownership(w, event_bus, halo, civ)
+
+    transfer_system_ownership(w, event_bus, halo, civ, replica=True)
+    assert w.get_entity_component(halo, SystemComponent).owning_civ == civ
@@ -0,0 +1,69 @@
+import random
+
+from seed.common.timer_wheel import TimerWheel
+
+
+def test_same_tick_items_come_out_in_scheduling_order():
+    wheel = TimerWheel(num_slots=4, num_blocks=2)
+    for item in range(5):
+        wheel.schedule(2, item)
+
+    assert wheel.advance() == []
+    assert wheel.advance() == [0, 1, 2, 3, 4]
+    assert len(wheel) == 0
+
+
+def test_outer_wheel_cascades_into_the_inner_wheel():
+    wheel = TimerWheel(num_slots=4, num_blocks=3)
+    wheel.schedule(9, "b")
+    wheel.schedule(5, "a")
+    wheel.schedule(9, "c")
+    assert len(wheel) == 3
+
+    out = {wheel.current_tick + 1: wheel.advance() for _ in range(10)}
+    assert out[5] == ["a"]
+    assert out[9] == ["b", "c"]
+    assert sum(map(len, out.values())) == 3
+
+
+def test_overflow_moves_back_into_the_wheels():
+    wheel = TimerWheel(num_slots=4, num_blocks=2)
+    wheel.schedule(30, "far")
+    wheel.schedule(13, "b")
+    wheel.schedule(13, "a")
+    wheel.schedule(3, "near")
+
+    out = {wheel.current_tick + 1: wheel.advance() for _ in range(32)}
+    assert out[3] == ["near"]
+    assert out[13] == ["b", "a"]
+    assert out[30] == ["far"]
+    assert len(wheel) == 0
+
+
+def test_past_ticks_are_due_on_the_next_advance():
+    wheel = TimerWheel(start_tick=10, num_slots=4, num_blocks=2)
+    wheel.schedule(3, "past")
+    wheel.schedule(10, "now")
+    wheel.schedule(11, "next")
+
+    assert wheel.advance() == ["past", "now", "next"]
+    assert wheel.advance() == []
+
+
+def test_matches_a_sorted_schedule():
+    rng = random.Random(0)
+    wheel = TimerWheel(num_slots=4, num_blocks=3)
+    expected = []  # (tick, scheduling order, item)
+    order = 0
+    for step in range(400):
+        for _ in range(rng.randrange(3)):
+            tick = wheel.current_tick + rng.randrange(-2, 60)
+            wheel.schedule(tick, step)
+            expected.append((max(tick, wheel.current_tick + 1), order, step))
+            order += 1
+
+        tick = wheel.current_tick + 1
+        due = [item for t, _, item in sorted(expected) if t == tick]
+        assert wheel.advance() == due
+        expected = [entry for entry in expected if entry[0] != tick]
+        assert len(wheel) == len(expected)
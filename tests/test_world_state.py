@@ -0,0 +1,159 @@
+import pytest
+
+from seed.world_state import WorldState
+from seed.common.base_types import FleetComponent, SystemComponent, entity_index
+
+
+def make_fleet(size=1, owning_civ=None):
+    return FleetComponent(owning_civ=owning_civ, size=size, parked_system=None)
+
+
+def sizes(w):
+    return {e: fleet.size for e, (fleet,) in w.get_components(FleetComponent)}
+
+
+def test_stale_handles_are_detected_after_recycling():
+    w = WorldState()
+    first = w.add_entity(make_fleet(1))
+    w.remove_entity(first)
+    assert not w.has_entity(first)
+
+    second = w.add_entity(make_fleet(2))
+    assert entity_index(second) == entity_index(first)
+    assert second != first
+
+    for call in (
+        lambda: w.get_entity_component(first, FleetComponent),
+        lambda: w.has_component(first, FleetComponent),
+        lambda: w.add_to_entity(first, make_fleet(3)),
+        lambda: w.remove_entity(first),
+    ):
+        with pytest.raises(KeyError):
+            call()
+
+    assert w.has_entity(second)
+    assert sizes(w) == {second: 2}
+
+
+@pytest.mark.parametrize("columnar", [False, True])
+def test_despawning_many_rows_keeps_the_rest(columnar):
+    w = WorldState()
+    if columnar:
+        w.use_columnar(FleetComponent)
+
+    entities = [w.add_entity(make_fleet(i)) for i in range(10)]
+    despawned = [entities[i] for i in (0, 3, 4, 8, 9)]
+    for e in despawned + despawned[:2]:
+        w.despawn(e)
+
+    assert w.flush_despawned() == len(despawned)
+    kept = {e: i for i, e in enumerate(entities) if e not in despawned}
+    assert sizes(w) == kept
+    for e, size in kept.items():
+        assert w.get_entity_component(e, FleetComponent).size == size
+    for e in despawned:
+        assert not w.has_entity(e)
+
+
+def test_queries_are_cached_until_a_matching_row_changes():
+    w = WorldState()
+    a = w.add_entity(make_fleet(1))
+    rows = w.get_components(FleetComponent)
+    assert w.get_components(FleetComponent) is rows
+
+    # Entities without the type don't invalidate the query
+    w.add_entity(SystemComponent(position=(0.0, 0.0)))
+    assert w.get_components(FleetComponent) is rows
+
+    # A new archetype with the type joins the existing query
+    b = w.add_entity(make_fleet(2), SystemComponent(position=(1.0, 0.0)))
+    assert sizes(w) == {a: 1, b: 2}
+    [(entity, (system, fleet))] = w.get_components(SystemComponent, FleetComponent)
+    assert entity == b and fleet.size == 2 and system.position == (1.0, 0.0)
+
+    w.remove_from_entity(b, FleetComponent)
+    assert sizes(w) == {a: 1}
+    assert w.get_components(SystemComponent, FleetComponent) == []
+
+    w.remove_entity(a)
+    assert sizes(w) == {}
+
+
+@pytest.mark.parametrize("columnar", [False, True])
+def test_index_follows_assignment_replacement_and_removal(columnar):
+    w = WorldState()
+    if columnar:
+        w.use_columnar(FleetComponent)
+
+    civ_a = w.add_entity(SystemComponent(position=(0.0, 0.0)))
+    civ_b = w.add_entity(SystemComponent(position=(1.0, 0.0)))
+    fleets = [w.add_entity(make_fleet(1, civ_a)) for _ in range(4)]
+    index = w.index(FleetComponent, "owning_civ")
+    assert index[civ_a] == set(fleets)
+
+    w.get_entity_component(fleets[0], FleetComponent).owning_civ = civ_b
+    w.add_to_entity(fleets[1], make_fleet(1, civ_b))
+    w.remove_entity(fleets[2])
+    late = w.add_entity(make_fleet(1, None))
+
+    assert index[civ_a] == {fleets[3]}
+    assert index[civ_b] == {fleets[0], fleets[1]}
+    assert index[None] == {late}
+
+    w.despawn(fleets[3])
+    w.end_tick()
+    assert civ_a not in index.buckets
+
+
+def test_use_columnar_invalidates_cached_queries():
+    w = WorldState()
+    e = w.add_entity(make_fleet(3))
+    w.get_components(FleetComponent)
+
+    w.use_columnar(FleetComponent)
+    [(entity, (fleet,))] = w.get_components(FleetComponent)
+    fleet.size = 7
+
+    assert entity == e
+    assert isinstance(fleet, w.get_column_store(FleetComponent).view_class)
+    assert w.get_entity_component(e, FleetComponent).size == 7
+
+
+def test_stale_column_view_raises():
+    w = WorldState()
+    w.use_columnar(FleetComponent)
+    first = w.add_entity(make_fleet(1))
+    second = w.add_entity(make_fleet(2))
+    view = w.get_entity_component(first, FleetComponent)
+
+    # The last row moves into the removed one, then the slot gets recycled
+    w.remove_entity(first)
+    recycled = w.add_entity(make_fleet(3))
+    assert entity_index(recycled) == entity_index(first)
+
+    with pytest.raises(KeyError):
+        view.size
+    with pytest.raises(KeyError):
+        view.size = 4
+
+    assert w.get_entity_component(second, FleetComponent).size == 2
+    assert w.get_entity_component(recycled, FleetComponent).size == 3
+
+
+def test_replacing_a_component_added_this_tick_keeps_it_added():
+    w = WorldState()
+    e = w.add_entity(make_fleet(1))
+    w.add_to_entity(e, make_fleet(2))
+    w.end_tick()
+
+    changes = w.changes(FleetComponent)
+    assert e in changes.added
+    assert e not in changes.modified and e not in changes.removed
+
+    w.add_to_entity(e, make_fleet(3))
+    w.end_tick()
+
+    changes = w.changes(FleetComponent)
+    assert e in changes.modified
+    assert e not in changes.added and e not in changes.removed
+    assert w.get_entity_component(e, FleetComponent).size == 3